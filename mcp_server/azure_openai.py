@@ -1,7 +1,12 @@
 from openai import AzureOpenAI
 import os
 import sys
+from typing import List, Optional
 from dotenv import load_dotenv
+from .classification_cache import classification_cache, normalize_prompt
+from .local_classifier import local_classifier
+from .single_flight import classification_flight
+from .classification_batcher import build_batch_messages, create_batcher_from_env, parse_batch_labels
 
 # Load environment variables from .env file
 load_dotenv()
@@ -37,11 +42,12 @@ except Exception as e:
     sys.exit(1)
 
 
-def choose_db_from_prompt(prompt: str) -> str:
+def choose_db_from_prompt(prompt: str, use_cache: bool = True) -> str:
     """Classify a prompt to determine which database to use (postgres or neo4j)
     
     Args:
         prompt: The user prompt to classify
+        use_cache: Set to False to skip the cache lookup (the fresh result still refreshes the entry)
         
     Returns:
         str: Either 'postgres' or 'neo4j'
@@ -49,23 +55,61 @@ def choose_db_from_prompt(prompt: str) -> str:
     Raises:
         Exception: If the API call fails
     """
+    if use_cache:
+        cached = classification_cache.get(prompt)
+        if cached is not None:
+            return cached
+
+    # Confident local predictions skip the network round trip entirely
+    local_choice = local_classifier.classify(prompt)
+    if local_choice is not None:
+        return local_choice
+
+    # Identical prompts arriving concurrently share one Azure call
+    return classification_flight.do(normalize_prompt(prompt), _classify_with_llm, prompt)
+
+
+def _classify_with_llm(prompt: str) -> str:
+    """Ask Azure OpenAI for a classification and cache valid answers"""
     try:
-        response = client.chat.completions.create(
-            model=AZURE_DEPLOYMENT,
-            messages=[
-                {"role": "system", "content": "You are a classifier. Respond only with 'postgres' or 'neo4j'."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        result = response.choices[0].message.content.strip().lower()
+        if classification_batcher is not None:
+            result = classification_batcher.classify(prompt)
+        else:
+            result = _request_classification(prompt)
         
         # Validate response is either postgres or neo4j
         if result not in ["postgres", "neo4j"]:
             print(f"Warning: Unexpected classification result: {result}. Defaulting to postgres.")
             return "postgres"
             
+        classification_cache.put(prompt, result)
         return result
     except Exception as e:
         print(f"Error classifying prompt: {e}")
         # Default to postgres in case of error
         return "postgres"
+
+
+def _request_classification(prompt: str) -> str:
+    """Classify a single prompt with one chat completion"""
+    response = client.chat.completions.create(
+        model=AZURE_DEPLOYMENT,
+        messages=[
+            {"role": "system", "content": "You are a classifier. Respond only with 'postgres' or 'neo4j'."},
+            {"role": "user", "content": prompt}
+        ]
+    )
+    return response.choices[0].message.content.strip().lower()
+
+
+def _request_batch_classification(prompts: List[str]) -> List[Optional[str]]:
+    """Classify several prompts with one chat completion"""
+    response = client.chat.completions.create(
+        model=AZURE_DEPLOYMENT,
+        messages=build_batch_messages(prompts)
+    )
+    return parse_batch_labels(response.choices[0].message.content, len(prompts))
+
+
+# Opt-in (CLASSIFICATION_BATCH_ENABLED); None means one request per prompt
+classification_batcher = create_batcher_from_env(_request_batch_classification, _request_classification)
@@ -0,0 +1,273 @@
+"""
+Bulk prompt ingestion
+Streams NDJSON or CSV rows, classifies them with bounded concurrency and loads
+them in batches (COPY on Postgres, UNWIND on Neo4j). Memory use depends only on
+the concurrency and batch size, never on the size of the input.
+"""
+
+import asyncio
+import csv
+import json
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BULK_INGEST_CONCURRENCY = int(os.getenv("BULK_INGEST_CONCURRENCY", "16"))
+BULK_INGEST_BATCH_SIZE = int(os.getenv("BULK_INGEST_BATCH_SIZE", "1000"))
+BULK_INGEST_FORMATS = ("ndjson", "csv")
+# The only directory the bulk_ingest tool may read from; unset disables server-side files
+BULK_INGEST_DIR = os.getenv("BULK_INGEST_DIR", "")
+
+# Per-row errors echoed back in an ingest result; the rest are only counted
+BULK_INGEST_MAX_REPORTED_ERRORS = 100
+
+# Read size for server-side files
+_FILE_CHUNK_SIZE = 1 << 16
+
+
+class RowError(ValueError):
+    """A single input row could not be parsed"""
+
+
+async def iter_lines(chunks: AsyncIterator[Any]) -> AsyncIterator[str]:
+    """Split a stream of bytes/str chunks into lines without buffering the whole input"""
+    buffer = ""
+    async for chunk in chunks:
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode("utf-8", errors="replace")
+        buffer += chunk
+        lines = buffer.split("\n")
+        buffer = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+def _in_quotes_after(line: str, in_quotes: bool) -> bool:
+    """Whether a CSV record is still inside a quoted field at the end of line
+
+    A quote only opens a field at its start (as in the csv module's default
+    dialect); inside a quoted field a doubled quote is a literal quote.
+    """
+    field_start = not in_quotes
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if in_quotes:
+            if char == '"':
+                if line[i + 1:i + 2] == '"':
+                    i += 1
+                else:
+                    in_quotes = False
+        elif char == '"' and field_start:
+            in_quotes = True
+        field_start = char == "," and not in_quotes
+        i += 1
+    return in_quotes
+
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, str]]:
+    """Join lines into CSV records, yielding (first line number, record)
+
+    Lines are joined while a quoted field is open, so fields containing
+    newlines stay in one record. An unterminated quote at the end of the
+    input is yielded as is and fails to parse instead of being split into rows.
+    """
+    record: List[str] = []
+    start = 0
+    in_quotes = False
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not record:
+            start = line_number
+        record.append(line)
+        in_quotes = _in_quotes_after(line, in_quotes)
+        if not in_quotes:
+            yield start, "\n".join(record)
+            record = []
+    if record:
+        yield start, "\n".join(record)
+
+
+def parse_csv_record(record: str) -> List[str]:
+    """Split one CSV record (as joined by iter_csv_records) into fields"""
+    try:
+        rows = list(csv.reader([record], strict=True))
+    except csv.Error as e:
+        raise RowError(f"Invalid CSV: {e}") from None
+    return rows[0] if rows else []
+
+
+def resolve_ingest_path(path: str, root: str = BULK_INGEST_DIR) -> str:
+    """Resolve a server-side file inside the ingest directory, rejecting anything outside it
+
+    Relative paths are taken from the ingest directory; symlinks and ".." are
+    resolved before the containment check.
+    """
+    if not root:
+        raise ValueError("Server-side ingestion is disabled; set BULK_INGEST_DIR")
+    if not path:
+        raise ValueError("path is required")
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Path is outside the ingest directory: {path}")
+    if not os.path.isfile(resolved):
+        raise ValueError(f"No such file in the ingest directory: {path}")
+    return resolved
+
+
+async def iter_file_chunks(path: str) -> AsyncIterator[bytes]:
+    """Read a server-side file in chunks without blocking the event loop"""
+    with open(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, _FILE_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def detect_format(name: Optional[str] = None, content_type: Optional[str] = None) -> str:
+    """Guess the input format from a file name or content type (defaults to NDJSON)"""
+    if (name and name.lower().endswith(".csv")) or (content_type and "csv" in content_type):
+        return "csv"
+    return "ndjson"
+
+
+class BulkIngestor:
+    """Classifies and loads a stream of prompts, yielding progress events
+
+    Args:
+        classify: Async function returning 'postgres' or 'neo4j' for a prompt
+        loaders: Backend name -> async function that loads a batch of prompts
+        concurrency: Maximum classifications in flight
+        batch_size: Rows per backend load
+        progress_every: Emit a progress event every this many input rows
+    """
+
+    def __init__(self, classify: Callable[[str], Awaitable[str]],
+                 loaders: Dict[str, Callable[[List[str]], Awaitable[Any]]],
+                 concurrency: int = BULK_INGEST_CONCURRENCY, batch_size: int = BULK_INGEST_BATCH_SIZE,
+                 progress_every: int = 1000):
+        self.classify = classify
+        self.loaders = loaders
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.progress_every = max(1, progress_every)
+        self._buffers: Dict[str, List[str]] = {backend: [] for backend in loaders}
+        self.counts = {"rows": 0, "errors": 0, **{backend: 0 for backend in loaders}}
+
+    async def run(self, lines: AsyncIterator[str], fmt: str = "ndjson") -> AsyncIterator[Dict[str, Any]]:
+        """Consume input lines and yield error, progress and summary events"""
+        if fmt not in BULK_INGEST_FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        pending: set = set()
+        column: Optional[int] = None
+        records = iter_csv_records(lines) if fmt == "csv" else self._numbered(lines)
+
+        async for line_number, line in records:
+            if not line.strip():
+                continue
+            try:
+                if fmt == "csv":
+                    fields = parse_csv_record(line)
+                    if column is None:
+                        column = self._prompt_column(fields)
+                        if column >= 0:
+                            continue  # header row
+                    prompt = self._parse_csv(fields, column)
+                else:
+                    prompt = self._parse_ndjson(line)
+            except RowError as e:
+                self.counts["errors"] += 1
+                yield {"type": "error", "line": line_number, "error": str(e)}
+                continue
+
+            self.counts["rows"] += 1
+            if len(pending) >= self.concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                async for event in self._handle_done(done):
+                    yield event
+            pending.add(asyncio.create_task(self._classify_row(line_number, prompt)))
+
+            if self.counts["rows"] % self.progress_every == 0:
+                yield {"type": "progress", **self.counts}
+
+        if pending:
+            done, _ = await asyncio.wait(pending)
+            async for event in self._handle_done(done):
+                yield event
+        for backend in self._buffers:
+            async for event in self._load(backend):
+                yield event
+        yield {"type": "summary", **self.counts}
+
+    @staticmethod
+    async def _numbered(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, str]]:
+        line_number = 0
+        async for line in lines:
+            line_number += 1
+            yield line_number, line
+
+    @staticmethod
+    def _prompt_column(header: List[str]) -> int:
+        """Index of the prompt column if the first CSV row is a header, else -1"""
+        names = [field.strip().lower() for field in header]
+        for candidate in ("prompt", "name"):
+            if candidate in names:
+                return names.index(candidate)
+        return -1
+
+    @staticmethod
+    def _parse_csv(fields: List[str], column: int) -> str:
+        prompt = fields[max(column, 0)].strip() if len(fields) > max(column, 0) else ""
+        if not prompt:
+            raise RowError("Empty prompt")
+        return prompt
+
+    @staticmethod
+    def _parse_ndjson(line: str) -> str:
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise RowError(f"Invalid JSON: {e}") from None
+        if isinstance(row, dict):
+            row = row.get("prompt", row.get("name"))
+        if not isinstance(row, str) or not row.strip():
+            raise RowError("Row has no 'prompt' string")
+        return row
+
+    async def _classify_row(self, line_number: int, prompt: str) -> Tuple[int, str, Optional[str], Optional[str]]:
+        try:
+            return line_number, prompt, await self.classify(prompt), None
+        except Exception as e:
+            return line_number, prompt, None, str(e)
+
+    async def _handle_done(self, done: set) -> AsyncIterator[Dict[str, Any]]:
+        for task in done:
+            line_number, prompt, backend, error = task.result()
+            if error is not None or backend not in self._buffers:
+                self.counts["errors"] += 1
+                yield {"type": "error", "line": line_number, "error": error or f"Unknown database: {backend}"}
+                continue
+            self._buffers[backend].append(prompt)
+            if len(self._buffers[backend]) >= self.batch_size:
+                async for event in self._load(backend):
+                    yield event
+
+    async def _load(self, backend: str) -> AsyncIterator[Dict[str, Any]]:
+        batch, self._buffers[backend] = self._buffers[backend], []
+        if not batch:
+            return
+        try:
+            await self.loaders[backend](batch)
+        except Exception as e:
+            self.counts["errors"] += len(batch)
+            yield {"type": "error", "database": backend, "rows": len(batch), "error": str(e)}
+            return
+        self.counts[backend] += len(batch)
+        yield {"type": "progress", **self.counts}
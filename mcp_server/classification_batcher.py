@@ -0,0 +1,180 @@
+"""
+Classification micro-batching
+Collects prompts for a few milliseconds and classifies them with a single
+chat completion, fanning the labels back out to the waiting callers
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CLASSIFICATION_BATCH_ENABLED = os.getenv("CLASSIFICATION_BATCH_ENABLED", "false").lower() == "true"
+CLASSIFICATION_BATCH_WINDOW_MS = float(os.getenv("CLASSIFICATION_BATCH_WINDOW_MS", "10"))
+CLASSIFICATION_BATCH_MAX_SIZE = int(os.getenv("CLASSIFICATION_BATCH_MAX_SIZE", "16"))
+
+VALID_LABELS = ("postgres", "neo4j")
+
+BATCH_SYSTEM_PROMPT = (
+    "You are a classifier. You will receive a JSON array of prompts. "
+    "Respond only with a JSON array of the same length, in the same order, "
+    "where each element is either 'postgres' or 'neo4j'."
+)
+
+logger = logging.getLogger("classification_batcher")
+
+
+def build_batch_messages(prompts: List[str]) -> List[Dict[str, str]]:
+    """Build the chat messages that classify several prompts in one request"""
+    return [
+        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+        {"role": "user", "content": json.dumps(prompts)}
+    ]
+
+
+def parse_batch_labels(content: str, count: int) -> List[Optional[str]]:
+    """Parse a batch response into one label per prompt
+
+    Items that are missing or not a valid label come back as None so the
+    caller can fall back to classifying them individually.
+    """
+    text = content.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("["):] if "[" in text else text
+    try:
+        labels = json.loads(text)
+    except ValueError:
+        return [None] * count
+    if not isinstance(labels, list):
+        return [None] * count
+
+    parsed: List[Optional[str]] = []
+    for label in labels[:count]:
+        label = label.strip().lower() if isinstance(label, str) else None
+        parsed.append(label if label in VALID_LABELS else None)
+    return parsed + [None] * (count - len(parsed))
+
+
+class MicroBatcher:
+    """Groups concurrent classification requests into batched LLM calls
+
+    Args:
+        batch_fn: Classifies a list of prompts, returning one label (or None) per prompt
+        single_fn: Classifies one prompt; used for lone requests and per-item fallback
+        window_ms: How long to wait for more prompts after the first one arrives
+        max_size: Flush as soon as this many prompts are waiting
+    """
+
+    def __init__(self, batch_fn: Callable[[List[str]], List[Optional[str]]],
+                 single_fn: Callable[[str], str], window_ms: float = 10, max_size: int = 16):
+        self.batch_fn = batch_fn
+        self.single_fn = single_fn
+        self.window = window_ms / 1000.0
+        self.max_size = max(1, max_size)
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="classification-batch")
+        self._collector: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.batched_items = 0
+        self.single_calls = 0
+        self.fallbacks = 0
+        self.batch_errors = 0
+        self.largest_batch = 0
+
+    def submit(self, prompt: str) -> Future:
+        """Queue a prompt; the returned future resolves to its label"""
+        with self._start_lock:
+            if self._collector is None:
+                self._collector = threading.Thread(target=self._collect, name="classification-batcher", daemon=True)
+                self._collector.start()
+        future: Future = Future()
+        self._queue.put((prompt, future))
+        return future
+
+    def classify(self, prompt: str) -> str:
+        """Blocking helper for threaded callers"""
+        return self.submit(prompt).result()
+
+    def _collect(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._executor.submit(self._flush, batch)
+
+    def _flush(self, batch: List[tuple]) -> None:
+        prompts = [prompt for prompt, _ in batch]
+        if len(batch) == 1:
+            self.single_calls += 1
+            self._resolve(batch[0], self.single_fn)
+            return
+
+        self.batches += 1
+        self.batched_items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            labels = self.batch_fn(prompts)
+        except Exception as e:
+            self.batch_errors += 1
+            logger.warning(f"Batch classification of {len(batch)} prompts failed: {e}")
+            labels = [None] * len(batch)
+
+        for item, label in zip(batch, labels):
+            if label is not None:
+                item[1].set_result(label)
+            else:
+                self.fallbacks += 1
+                self._resolve(item, self.single_fn)
+
+    @staticmethod
+    def _resolve(item: tuple, fn: Callable[[str], str]) -> None:
+        prompt, future = item
+        try:
+            future.set_result(fn(prompt))
+        except Exception as e:
+            future.set_exception(e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return batching counters"""
+        return {
+            "enabled": True,
+            "window_ms": self.window * 1000.0,
+            "max_size": self.max_size,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "batched_items": self.batched_items,
+            "average_batch_size": self.batched_items / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "single_calls": self.single_calls,
+            "fallbacks": self.fallbacks,
+            "batch_errors": self.batch_errors,
+        }
+
+
+def create_batcher_from_env(batch_fn: Callable[[List[str]], List[Optional[str]]],
+                            single_fn: Callable[[str], str]) -> Optional[MicroBatcher]:
+    """Build a batcher if CLASSIFICATION_BATCH_ENABLED is set, otherwise None"""
+    if not CLASSIFICATION_BATCH_ENABLED:
+        return None
+    return MicroBatcher(
+        batch_fn,
+        single_fn,
+        window_ms=CLASSIFICATION_BATCH_WINDOW_MS,
+        max_size=CLASSIFICATION_BATCH_MAX_SIZE,
+    )
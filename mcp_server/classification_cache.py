@@ -0,0 +1,144 @@
+"""
+Classification cache
+Bounded LRU/TTL cache for prompt -> database classifications, shared by the
+FastAPI app (main.py) and the stdio MCP server (mcp_server.py)
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+from .classification_store import ClassificationStore, create_store_from_env
+
+load_dotenv()
+
+CLASSIFICATION_CACHE_ENABLED = os.getenv("CLASSIFICATION_CACHE_ENABLED", "true").lower() == "true"
+CLASSIFICATION_CACHE_MAX_SIZE = int(os.getenv("CLASSIFICATION_CACHE_MAX_SIZE", "10000"))
+CLASSIFICATION_CACHE_TTL = float(os.getenv("CLASSIFICATION_CACHE_TTL", "3600"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize a prompt into a cache key (case-folded, whitespace collapsed)"""
+    return _WHITESPACE.sub(" ", prompt).strip().casefold()
+
+
+class ClassificationCache:
+    """Thread-safe LRU cache with per-entry expiry
+
+    Args:
+        max_size: Maximum number of entries kept before the least recently used is evicted
+        ttl: Seconds an entry stays valid (0 disables expiry)
+        enabled: When False, lookups always miss and nothing is stored
+        store: Optional persistent tier consulted on memory misses and written behind on puts
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 3600, enabled: bool = True,
+                 store: Optional[ClassificationStore] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled
+        self.store = store
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, prompt: str) -> Optional[str]:
+        """Return the cached classification for a prompt, or None on a miss"""
+        if not self.enabled:
+            return None
+        key = normalize_prompt(prompt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                label, expires_at = entry
+                if not expires_at or expires_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return label
+                del self._entries[key]
+                self.expirations += 1
+
+        label = self._get_from_store(key)
+        with self._lock:
+            if label is None:
+                self.misses += 1
+            else:
+                self.store_hits += 1
+        return label
+
+    def _get_from_store(self, key: str) -> Optional[str]:
+        """Look a key up in the persistent tier and promote it into memory"""
+        if self.store is None:
+            return None
+        stored = self.store.get(key)
+        if stored is None:
+            return None
+        label, updated_at = stored
+        remaining = self.ttl - (time.time() - updated_at) if self.ttl > 0 else 0
+        if self.ttl > 0 and remaining <= 0:
+            return None
+        self._insert(key, label, time.monotonic() + remaining if remaining else 0)
+        return label
+
+    def put(self, prompt: str, label: str) -> None:
+        """Store a classification, evicting the least recently used entries if full"""
+        if not self.enabled or self.max_size <= 0:
+            return
+        key = normalize_prompt(prompt)
+        self._insert(key, label, time.monotonic() + self.ttl if self.ttl > 0 else 0)
+        if self.store is not None:
+            self.store.put(key, label)
+
+    def _insert(self, key: str, label: str, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (label, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> int:
+        """Flush all entries and return how many were removed"""
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+        if self.store is not None:
+            self.store.clear()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss counters"""
+        with self._lock:
+            hits = self.hits + self.store_hits
+            lookups = hits + self.misses
+            stats = {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+        stats["store"] = self.store.stats() if self.store is not None else None
+        return stats
+
+
+classification_cache = ClassificationCache(
+    max_size=CLASSIFICATION_CACHE_MAX_SIZE,
+    ttl=CLASSIFICATION_CACHE_TTL,
+    enabled=CLASSIFICATION_CACHE_ENABLED,
+    store=create_store_from_env() if CLASSIFICATION_CACHE_ENABLED else None,
+)
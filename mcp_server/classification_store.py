@@ -0,0 +1,202 @@
+"""
+Persistent classification store
+SQLite-backed tier under the in-memory classification cache so that warm
+classifications survive server restarts
+"""
+
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger("classification_store")
+
+
+class ClassificationStore:
+    """Durable key -> label store with lazy open, write-behind and size-capped compaction
+
+    Args:
+        path: SQLite database file (the directory is created if needed)
+        max_entries: Row count above which the oldest entries are compacted away
+        flush_interval: Seconds the background writer waits to batch pending writes
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000, flush_interval: float = 1.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # Lookups use their own connection: in WAL mode they are not blocked by a flush or compaction
+        self._read_conn: Optional[sqlite3.Connection] = None
+        self._read_lock = threading.Lock()
+        self._pending: Dict[str, Tuple[str, float]] = {}
+        # The batch being written: still visible to lookups until it is committed
+        self._flushing: Dict[str, Tuple[str, float]] = {}
+        self._pending_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self.reads = 0
+        self.writes = 0
+        self.compactions = 0
+        self.errors = 0
+
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS classifications ("
+            "key TEXT PRIMARY KEY, label TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS classifications_updated_at ON classifications (updated_at)")
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        # Callers hold self._lock
+        if self._conn is None:
+            self._conn = self._open()
+            logger.info(f"Opened classification store at {self.path}")
+        return self._conn
+
+    def _read_connection(self) -> sqlite3.Connection:
+        # Callers hold self._read_lock
+        if self._read_conn is None:
+            self._read_conn = self._open()
+        return self._read_conn
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return (label, updated_at) for a normalized key, or None"""
+        with self._pending_lock:
+            pending = self._pending.get(key) or self._flushing.get(key)
+        if pending is not None:
+            return pending
+        try:
+            with self._read_lock:
+                row = self._read_connection().execute(
+                    "SELECT label, updated_at FROM classifications WHERE key = ?", (key,)
+                ).fetchone()
+                self.reads += 1
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Classification store read failed: {e}")
+            return None
+        return (row[0], row[1]) if row else None
+
+    def put(self, key: str, label: str) -> None:
+        """Queue a write; the background writer persists it asynchronously"""
+        with self._pending_lock:
+            self._pending[key] = (label, time.time())
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="classification-store-writer", daemon=True)
+                self._writer.start()
+        self._wakeup.set()
+
+    def _write_loop(self) -> None:
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all pending entries now and compact if over the size cap"""
+        # Flushes are serialized by self._lock; lookups only need self._pending_lock
+        with self._lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+            if not batch:
+                return 0
+            committed = False
+            try:
+                conn = self._connection()
+                try:
+                    conn.execute("BEGIN")
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO classifications (key, label, updated_at) VALUES (?, ?, ?)",
+                        [(key, label, updated_at) for key, (label, updated_at) in batch.items()]
+                    )
+                    conn.execute("COMMIT")
+                    committed = True
+                except sqlite3.Error:
+                    # Leave the shared autocommit connection usable for the next flush
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+                finally:
+                    with self._pending_lock:
+                        if not committed:
+                            # Retried with the next flush; entries queued since then are newer and win
+                            for key, entry in batch.items():
+                                self._pending.setdefault(key, entry)
+                        self._flushing = {}
+                self.writes += len(batch)
+                self._compact_if_needed(conn)
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.warning(f"Classification store write failed: {e}")
+                if not committed:
+                    return 0
+        return len(batch)
+
+    def _compact_if_needed(self, conn: sqlite3.Connection) -> None:
+        count = conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        # Drop down to 90% of the cap so compaction doesn't run on every flush
+        excess = count - int(self.max_entries * 0.9)
+        conn.execute(
+            "DELETE FROM classifications WHERE key IN "
+            "(SELECT key FROM classifications ORDER BY updated_at ASC LIMIT ?)",
+            (excess,)
+        )
+        conn.execute("VACUUM")
+        self.compactions += 1
+        logger.info(f"Compacted classification store, removed {excess} entries")
+
+    def clear(self) -> None:
+        """Remove all persisted and pending entries"""
+        with self._pending_lock:
+            self._pending.clear()
+        try:
+            with self._lock:
+                self._connection().execute("DELETE FROM classifications")
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Classification store clear failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return I/O counters for the store"""
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {
+            "path": self.path,
+            "opened": self._conn is not None,
+            "max_entries": self.max_entries,
+            "pending_writes": pending,
+            "reads": self.reads,
+            "writes": self.writes,
+            "compactions": self.compactions,
+            "errors": self.errors,
+        }
+
+
+def create_store_from_env() -> Optional[ClassificationStore]:
+    """Build the store configured by CLASSIFICATION_STORE_PATH, or None if unset"""
+    path = os.getenv("CLASSIFICATION_STORE_PATH", "")
+    if not path:
+        return None
+    store = ClassificationStore(
+        path,
+        max_entries=int(os.getenv("CLASSIFICATION_STORE_MAX_ENTRIES", "100000")),
+        flush_interval=float(os.getenv("CLASSIFICATION_STORE_FLUSH_INTERVAL", "1.0")),
+    )
+    atexit.register(store.flush)
+    return store
@@ -1,20 +1,48 @@
-from typing import Protocol, Any
+from contextlib import contextmanager
+from typing import Protocol, Any, ContextManager, Dict, Iterator, List
+
+class DatabaseSession(Protocol):
+    """A backend handle leased to a single request"""
+    def insert(self, data: dict) -> str: ...
+    def insert_many(self, rows: List[dict]) -> str: ...
+    def read(self, query: str) -> Any: ...
 
 class DatabaseProtocol(Protocol):
     def connect(self) -> None: ...
     def insert(self, data: dict) -> str: ...
-    def read(self, query: str) -> Any: ...
+    def insert_many(self, rows: List[dict]) -> str: ...
+    def read(self, query: str, guarded: bool = False, use_cache: bool = True) -> Any: ...
+    def session(self) -> ContextManager[DatabaseSession]: ...
     def close(self) -> None: ...
 
-class DBContext:
-    def __init__(self, db: DatabaseProtocol):
-        self.db = db
+class DBRouter:
+    """Routes each request to its own leased session on the chosen backend
+
+    Replaces a process-global "current database": nothing is switched, so
+    concurrent requests against different backends never see each other's
+    choice, and each lease holds its own pooled connection or driver session.
+    """
+    def __init__(self, backends: Dict[str, DatabaseProtocol]):
+        self.backends = backends
+
+    def get(self, name: str) -> DatabaseProtocol:
+        try:
+            return self.backends[name]
+        except KeyError:
+            raise ValueError(f"Unknown database: {name}") from None
+
+    @contextmanager
+    def session(self, name: str) -> Iterator[DatabaseSession]:
+        with self.get(name).session() as session:
+            yield session
+
+    # The backend methods lease their own session and keep the query cache in step
 
-    def switch(self, db: DatabaseProtocol):
-        self.db = db
+    def insert(self, name: str, data: dict):
+        return self.get(name).insert(data)
 
-    def insert(self, data: dict):
-        return self.db.insert(data)
+    def insert_many(self, name: str, rows: List[dict]):
+        return self.get(name).insert_many(rows)
 
-    def read(self, query: str):
-        return self.db.read(query)
+    def read(self, name: str, query: str, guarded: bool = False, use_cache: bool = True):
+        return self.get(name).read(query, guarded=guarded, use_cache=use_cache)
@@ -0,0 +1,224 @@
+"""
+Federated queries
+Joins a SQL result with a Cypher result inside the server. The Cypher side is
+collected into a hash table keyed on the join key while the SQL query starts
+on its own server-side cursor; SQL rows are then streamed through the table in
+batches. Only the joined, projected (and optionally aggregated) rows are
+returned.
+"""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+from .result_paging import ResultHandle
+
+load_dotenv()
+
+FEDERATED_MAX_ROWS = int(os.getenv("FEDERATED_MAX_ROWS", "10000"))
+FEDERATED_MAX_BUILD_ROWS = int(os.getenv("FEDERATED_MAX_BUILD_ROWS", "200000"))
+FEDERATED_BATCH_SIZE = int(os.getenv("FEDERATED_BATCH_SIZE", "1000"))
+
+JOIN_TYPES = ("inner", "left")
+AGGREGATES = ("count", "sum", "avg", "min", "max")
+
+_AGGREGATE = re.compile(r"^\s*(\w+)\s*\(\s*(\*|[\w.]+)\s*\)\s*$")
+
+
+def iter_rows(handle: ResultHandle, batch_size: int = FEDERATED_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """Stream a result handle as dicts, one batch at a time"""
+    while True:
+        rows = handle.next_rows(batch_size)
+        if not rows:
+            return
+        columns = handle.columns
+        for row in rows:
+            yield row if isinstance(row, dict) else dict(zip(columns, row))
+
+
+def _key(value: Any) -> Any:
+    # Postgres and Neo4j may return the same key as different types (int vs float, uuid vs str)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (int, str)) or value is None:
+        return value
+    return str(value)
+
+
+def build_table(handle: ResultHandle, key: str, max_rows: int = FEDERATED_MAX_BUILD_ROWS):
+    """Collect the build side into key -> rows; returns (table, row count, columns)"""
+    table: Dict[Any, List[Dict[str, Any]]] = {}
+    count = 0
+    try:
+        for row in iter_rows(handle):
+            if key not in row:
+                raise ValueError(f"Join key {key!r} is not a column of the Cypher result")
+            count += 1
+            if count > max_rows:
+                raise ValueError(f"Cypher side returned more than {max_rows} rows; filter or aggregate it")
+            table.setdefault(_key(row[key]), []).append(row)
+        return table, count, handle.columns or []
+    finally:
+        handle.close()
+
+
+class FederatedJoin:
+    """Hash join of streamed SQL rows against a Cypher hash table
+
+    Args:
+        sql_key: Join column of the SQL result
+        cypher_key: Join column of the Cypher result
+        how: "inner" or "left" (left keeps SQL rows without a match)
+        select: Output columns ("sql.col", "cypher.col" or a bare name); all columns by default
+        group_by: Columns to group the joined rows by
+        aggregates: Output name -> "count(*)", "sum(col)", "avg(col)", "min(col)" or "max(col)"
+        max_rows: Maximum rows returned
+    """
+
+    def __init__(self, sql_key: str, cypher_key: str, how: str = "inner", select: Optional[List[str]] = None,
+                 group_by: Optional[List[str]] = None, aggregates: Optional[Dict[str, str]] = None,
+                 max_rows: int = FEDERATED_MAX_ROWS):
+        if how not in JOIN_TYPES:
+            raise ValueError(f"Unsupported join type: {how}")
+        self.sql_key = sql_key
+        self.cypher_key = cypher_key
+        self.how = how
+        self.select = select
+        self.group_by = group_by or []
+        self.aggregates = {name: self._parse_aggregate(spec) for name, spec in (aggregates or {}).items()}
+        self.max_rows = max_rows
+        self.stats = {"sql_rows": 0, "cypher_rows": 0, "joined_rows": 0}
+
+    @classmethod
+    def from_arguments(cls, arguments: Dict[str, Any]) -> "FederatedJoin":
+        """Build a join from federated_query tool arguments"""
+        for required in ("sql", "cypher"):
+            if not arguments.get(required):
+                raise ValueError(f"{required} is required")
+        sql_key = arguments.get("sql_key") or arguments.get("join_key")
+        cypher_key = arguments.get("cypher_key") or arguments.get("join_key")
+        if not sql_key or not cypher_key:
+            raise ValueError("join_key (or sql_key and cypher_key) is required")
+        return cls(
+            sql_key=sql_key,
+            cypher_key=cypher_key,
+            how=arguments.get("how", "inner"),
+            select=arguments.get("select"),
+            group_by=arguments.get("group_by"),
+            aggregates=arguments.get("aggregates"),
+            max_rows=min(int(arguments.get("max_rows") or FEDERATED_MAX_ROWS), FEDERATED_MAX_ROWS),
+        )
+
+    @staticmethod
+    def _parse_aggregate(spec: str) -> Tuple[str, str]:
+        match = _AGGREGATE.match(spec)
+        if not match or match.group(1).lower() not in AGGREGATES:
+            raise ValueError(f"Unsupported aggregate {spec!r}; use {', '.join(a + '(col)' for a in AGGREGATES)}")
+        return match.group(1).lower(), match.group(2)
+
+    @staticmethod
+    def _lookup(sql_row: Dict[str, Any], cypher_row: Optional[Dict[str, Any]], column: str) -> Any:
+        side, _, name = column.partition(".")
+        if name and side == "sql":
+            return sql_row.get(name)
+        if name and side == "cypher":
+            return cypher_row.get(name) if cypher_row else None
+        if column in sql_row:
+            return sql_row[column]
+        return cypher_row.get(column) if cypher_row else None
+
+    def _columns(self, sql_columns: List[str], cypher_columns: List[str]) -> List[str]:
+        if self.group_by or self.aggregates:
+            return list(self.group_by) + list(self.aggregates)
+        if self.select:
+            return list(self.select)
+        return [f"sql.{c}" for c in sql_columns] + [f"cypher.{c}" for c in cypher_columns]
+
+    def _joined(self, probe: ResultHandle, table: Dict[Any, List[Dict[str, Any]]]):
+        for sql_row in iter_rows(probe):
+            self.stats["sql_rows"] += 1
+            if self.sql_key not in sql_row:
+                raise ValueError(f"Join key {self.sql_key!r} is not a column of the SQL result")
+            matches = table.get(_key(sql_row[self.sql_key]))
+            if matches:
+                for cypher_row in matches:
+                    self.stats["joined_rows"] += 1
+                    yield sql_row, cypher_row
+            elif self.how == "left":
+                self.stats["joined_rows"] += 1
+                yield sql_row, None
+
+    def run(self, probe: ResultHandle, table: Dict[Any, List[Dict[str, Any]]], cypher_rows: int,
+            cypher_columns: List[str]) -> Dict[str, Any]:
+        """Stream the SQL handle through the table and return columns, rows and join statistics"""
+        self.stats["cypher_rows"] = cypher_rows
+        truncated = False
+        try:
+            columns = None
+            rows: List[List[Any]] = []
+            if self.group_by or self.aggregates:
+                rows = self._aggregate(self._joined(probe, table))
+                truncated = len(rows) > self.max_rows
+                rows = rows[:self.max_rows]
+            else:
+                for sql_row, cypher_row in self._joined(probe, table):
+                    if columns is None:
+                        columns = self._columns(probe.columns or list(sql_row), cypher_columns)
+                    if len(rows) >= self.max_rows:
+                        truncated = True
+                        break
+                    rows.append([self._lookup(sql_row, cypher_row, c) for c in columns])
+            if columns is None:
+                columns = self._columns(probe.columns or [], cypher_columns)
+        finally:
+            probe.close()
+        return {"columns": columns, "rows": rows, "row_count": len(rows), "truncated": truncated, **self.stats}
+
+    def _aggregate(self, joined) -> List[List[Any]]:
+        groups: Dict[tuple, List[Any]] = {}
+        for sql_row, cypher_row in joined:
+            group = tuple(_key(self._lookup(sql_row, cypher_row, c)) for c in self.group_by)
+            state = groups.get(group)
+            if state is None:
+                state = groups[group] = [[0, None] for _ in self.aggregates]
+            for slot, (func, column) in zip(state, self.aggregates.values()):
+                value = 1 if column == "*" else self._lookup(sql_row, cypher_row, column)
+                if value is None:
+                    continue
+                # slot = [count, running value]
+                slot[0] += 1
+                if func in ("sum", "avg"):
+                    slot[1] = (slot[1] or 0) + value
+                elif func == "min":
+                    slot[1] = value if slot[1] is None else min(slot[1], value)
+                elif func == "max":
+                    slot[1] = value if slot[1] is None else max(slot[1], value)
+        rows = []
+        for group, state in groups.items():
+            values = []
+            for (count, value), (func, _) in zip(state, self.aggregates.values()):
+                if func == "count":
+                    values.append(count)
+                elif func == "avg":
+                    values.append(value / count if count else None)
+                else:
+                    values.append(value)
+            rows.append(list(group) + values)
+        return rows
+
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="federated")
+
+
+def run_federated(open_build: Callable[[], ResultHandle], open_probe: Callable[[], ResultHandle],
+                  join: FederatedJoin) -> Dict[str, Any]:
+    """Collect the Cypher side while the SQL query starts, then stream the join (for synchronous callers)"""
+    build = _executor.submit(lambda: build_table(open_build(), join.cypher_key))
+    probe = _executor.submit(open_probe)
+    try:
+        table, count, columns = build.result()
+    except BaseException:
+        probe.add_done_callback(lambda f: f.exception() is None and f.result().close())
+        raise
+    return join.run(probe.result(), table, count, columns)
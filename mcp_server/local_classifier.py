@@ -0,0 +1,302 @@
+"""
+Local prompt classifier
+Hashed n-gram logistic regression that answers confident routing decisions
+locally and leaves ambiguous prompts to Azure OpenAI.
+
+Retrain from the prompts already stored in both databases with:
+    python -m mcp_server.local_classifier train
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+from .classification_cache import normalize_prompt
+
+load_dotenv()
+
+LOCAL_CLASSIFIER_ENABLED = os.getenv("LOCAL_CLASSIFIER_ENABLED", "true").lower() == "true"
+LOCAL_CLASSIFIER_MODEL_PATH = os.getenv("LOCAL_CLASSIFIER_MODEL_PATH", "")
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.9"))
+LOCAL_CLASSIFIER_N_FEATURES = 2 ** 18
+
+# Model output is P(neo4j); postgres is the negative class
+POSITIVE_LABEL = "neo4j"
+NEGATIVE_LABEL = "postgres"
+
+# How often (seconds) the server checks whether the model file was retrained
+_RELOAD_INTERVAL = 30.0
+
+_TOKEN = re.compile(r"[a-z0-9_]+")
+
+logger = logging.getLogger("local_classifier")
+
+
+def extract_features(prompt: str, n_features: int = LOCAL_CLASSIFIER_N_FEATURES) -> Dict[int, float]:
+    """Hash word unigrams/bigrams and character trigrams into an L2-normalized sparse vector"""
+    text = normalize_prompt(prompt)
+    tokens = _TOKEN.findall(text)
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    padded = f" {text} "
+    grams += ["#" + padded[i:i + 3] for i in range(len(padded) - 2)]
+
+    features: Dict[int, float] = {}
+    for gram in grams:
+        index = zlib.crc32(gram.encode("utf-8")) % n_features
+        features[index] = features.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+    return {index: value / norm for index, value in features.items()}
+
+
+def _sigmoid(z: float) -> float:
+    if z < -35:
+        return 0.0
+    if z > 35:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+def train(samples: List[Tuple[str, str]], epochs: int = 10, learning_rate: float = 0.5,
+          l2: float = 1e-6, seed: int = 13) -> Dict[str, Any]:
+    """Fit a class-balanced logistic regression with SGD
+
+    Args:
+        samples: (prompt, label) pairs with label 'postgres' or 'neo4j'
+        epochs: Passes over the data
+        learning_rate: Initial SGD step size (decays per epoch)
+        l2: L2 regularization strength
+        seed: Shuffle seed, for reproducible models
+
+    Returns:
+        dict: Serializable model (see LocalClassifier.load)
+    """
+    data = [(extract_features(prompt), 1.0 if label == POSITIVE_LABEL else 0.0) for prompt, label in samples]
+    positives = sum(1 for _, y in data if y == 1.0)
+    negatives = len(data) - positives
+    if not positives or not negatives:
+        raise ValueError("Training data needs examples of both 'postgres' and 'neo4j'")
+    class_weight = {1.0: len(data) / (2.0 * positives), 0.0: len(data) / (2.0 * negatives)}
+
+    weights: Dict[int, float] = {}
+    bias = 0.0
+    rng = random.Random(seed)
+    for epoch in range(epochs):
+        rng.shuffle(data)
+        rate = learning_rate / (1.0 + epoch)
+        for features, y in data:
+            z = bias + sum(weights.get(i, 0.0) * v for i, v in features.items())
+            gradient = (_sigmoid(z) - y) * class_weight[y]
+            for i, v in features.items():
+                w = weights.get(i, 0.0)
+                weights[i] = w - rate * (gradient * v + l2 * w)
+            bias -= rate * gradient
+
+    return {
+        "version": 1,
+        "n_features": LOCAL_CLASSIFIER_N_FEATURES,
+        "bias": bias,
+        "weights": {str(i): round(w, 6) for i, w in weights.items() if abs(w) > 1e-6},
+        "trained_at": time.time(),
+        "samples": len(data),
+    }
+
+
+class LocalClassifier:
+    """Serves a trained model file and answers only above a confidence threshold
+
+    Args:
+        model_path: JSON model written by the `train` CLI (missing file disables the stage)
+        threshold: Minimum probability of the predicted label to answer locally
+        enabled: When False, every prompt is deferred to the LLM
+    """
+
+    def __init__(self, model_path: str, threshold: float = 0.9, enabled: bool = True):
+        self.model_path = model_path
+        self.threshold = threshold
+        self.enabled = enabled
+        self._weights: Optional[Dict[int, float]] = None
+        self._bias = 0.0
+        self._n_features = LOCAL_CLASSIFIER_N_FEATURES
+        self._mtime = 0.0
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.answered = 0
+        self.deferred = 0
+
+    def load(self, model: Dict[str, Any]) -> None:
+        """Install a model dict as produced by train()"""
+        weights = {int(i): float(w) for i, w in model["weights"].items()}
+        with self._lock:
+            self._weights = weights
+            self._bias = float(model["bias"])
+            self._n_features = int(model.get("n_features", LOCAL_CLASSIFIER_N_FEATURES))
+
+    def _refresh(self) -> None:
+        """Load the model file lazily and pick up retrained versions"""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < _RELOAD_INTERVAL:
+            return
+        self._checked_at = now
+        if not self.model_path:
+            return
+        try:
+            mtime = os.path.getmtime(self.model_path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.model_path) as f:
+                self.load(json.load(f))
+            self._mtime = mtime
+            logger.info(f"Loaded local classifier model from {self.model_path}")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load local classifier model {self.model_path}: {e}")
+
+    def predict(self, prompt: str) -> Optional[Tuple[str, float]]:
+        """Return (label, confidence), or None if no model is loaded"""
+        self._refresh()
+        weights = self._weights
+        if weights is None:
+            return None
+        features = extract_features(prompt, self._n_features)
+        p = _sigmoid(self._bias + sum(weights.get(i, 0.0) * v for i, v in features.items()))
+        return (POSITIVE_LABEL, p) if p >= 0.5 else (NEGATIVE_LABEL, 1.0 - p)
+
+    def classify(self, prompt: str) -> Optional[str]:
+        """Return a label when the model is confident, otherwise None (ask the LLM)"""
+        if not self.enabled:
+            return None
+        prediction = self.predict(prompt)
+        if prediction is not None and prediction[1] >= self.threshold:
+            self.answered += 1
+            return prediction[0]
+        self.deferred += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many prompts were answered locally vs deferred"""
+        total = self.answered + self.deferred
+        return {
+            "enabled": self.enabled,
+            "model_loaded": self._weights is not None,
+            "model_path": self.model_path,
+            "threshold": self.threshold,
+            "answered": self.answered,
+            "deferred": self.deferred,
+            "answer_rate": self.answered / total if total else 0.0,
+        }
+
+
+local_classifier = LocalClassifier(
+    LOCAL_CLASSIFIER_MODEL_PATH,
+    threshold=LOCAL_CLASSIFIER_THRESHOLD,
+    enabled=LOCAL_CLASSIFIER_ENABLED,
+)
+
+
+def load_training_samples(limit: int = 0) -> Iterable[Tuple[str, str]]:
+    """Yield (prompt, label) pairs from Postgres `users` and Neo4j `Person` nodes"""
+    from .postgres_db import PostgresDB
+    from .neo4j_db import Neo4jDB
+
+    pg = PostgresDB()
+    pg.connect()
+    try:
+        query = "SELECT DISTINCT name FROM users WHERE name IS NOT NULL"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        for (name,) in pg.read(query):
+            yield name, NEGATIVE_LABEL
+    finally:
+        pg.close()
+
+    neo4j = Neo4jDB()
+    neo4j.connect()
+    try:
+        query = "MATCH (p:Person) WHERE p.name IS NOT NULL RETURN DISTINCT p.name AS name"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        for record in neo4j.read(query):
+            yield record["name"], POSITIVE_LABEL
+    finally:
+        neo4j.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point for offline training and spot checks"""
+    parser = argparse.ArgumentParser(description="Train or query the local prompt classifier")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_parser = subparsers.add_parser("train", help="Train from prompts stored in users/Person")
+    train_parser.add_argument("--output", default=LOCAL_CLASSIFIER_MODEL_PATH, help="Model file to write")
+    train_parser.add_argument("--epochs", type=int, default=10)
+    train_parser.add_argument("--limit", type=int, default=0, help="Max samples per database (0 = all)")
+    train_parser.add_argument("--holdout", type=float, default=0.1, help="Fraction held out for evaluation")
+
+    predict_parser = subparsers.add_parser("predict", help="Classify a prompt with the trained model")
+    predict_parser.add_argument("prompt")
+    predict_parser.add_argument("--model", default=LOCAL_CLASSIFIER_MODEL_PATH)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "predict":
+        classifier = LocalClassifier(args.model, threshold=LOCAL_CLASSIFIER_THRESHOLD)
+        prediction = classifier.predict(args.prompt)
+        if prediction is None:
+            print(f"No model found at {args.model!r}", file=sys.stderr)
+            return 1
+        label, confidence = prediction
+        verdict = "local" if confidence >= classifier.threshold else "defer to LLM"
+        print(f"{label} ({confidence:.3f}, {verdict})")
+        return 0
+
+    if not args.output:
+        print("Set LOCAL_CLASSIFIER_MODEL_PATH or pass --output", file=sys.stderr)
+        return 1
+
+    samples = list(load_training_samples(args.limit))
+    random.Random(7).shuffle(samples)
+    split = int(len(samples) * (1.0 - args.holdout))
+    train_set, test_set = samples[:split], samples[split:]
+    print(f"Training on {len(train_set)} prompts ({len(test_set)} held out)")
+
+    model = train(train_set, epochs=args.epochs)
+
+    if test_set:
+        classifier = LocalClassifier("", threshold=LOCAL_CLASSIFIER_THRESHOLD)
+        classifier.load(model)
+        correct = confident = confident_correct = 0
+        for prompt, label in test_set:
+            predicted, confidence = classifier.predict(prompt)
+            correct += predicted == label
+            if confidence >= classifier.threshold:
+                confident += 1
+                confident_correct += predicted == label
+        print(f"Held-out accuracy: {correct / len(test_set):.3f}")
+        if confident:
+            print(f"Answered locally: {confident / len(test_set):.1%} "
+                  f"with accuracy {confident_correct / confident:.3f}")
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{args.output}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(model, f)
+    os.replace(tmp_path, args.output)
+    print(f"Wrote model to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
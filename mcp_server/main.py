@@ -1,13 +1,32 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from pydantic import BaseModel, Field
 from typing import Dict, Any, List, Optional, Union
 from .postgres_db import PostgresDB
 from .neo4j_db import Neo4jDB
-from .azure_openai import choose_db_from_prompt
-from .db_interface import DBContext
+from .azure_openai import choose_db_from_prompt, classification_batcher
+from .classification_cache import classification_cache
+from .query_cache import query_cache
+from .query_catalog import query_catalog
+from .query_guard import query_guard
+from .query_plans import explain_query
+from .federated_query import FederatedJoin, run_federated
+from .result_encoding import BINARY_FORMATS, RESULT_FORMATS, QueryRows, check_format, encode_page, encode_rows
+from .resource_sync import (RESOURCE_BACKENDS, RESOURCE_HEAD_QUERIES, compute_etag, etag_matches, format_since,
+                            head_value, last_id, parse_since, rows_query)
+from .local_classifier import local_classifier
+from .single_flight import classification_flight
+from .db_interface import DBRouter
+from .write_behind import create_write_buffer_from_env
+from .bulk_ingest import BULK_INGEST_FORMATS, BULK_INGEST_MAX_REPORTED_ERRORS, BulkIngestor, detect_format, iter_lines
 
 class PromptRequest(BaseModel):
     prompt: str
+    bypass_cache: bool = False
 
 class Tool(BaseModel):
     name: str
@@ -21,35 +40,126 @@ class ToolCallRequest(BaseModel):
     name: str
     arguments: Dict[str, Any]
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Flush buffered inserts before the process exits
+    if write_buffer is not None:
+        write_buffer.close()
+
+app = FastAPI(lifespan=lifespan)
 
 pg = PostgresDB(); pg.connect()
 neo4j = Neo4jDB(); neo4j.connect()
-context = DBContext(pg)
+router = DBRouter({"postgres": pg, "neo4j": neo4j})
+write_buffer = create_write_buffer_from_env({"postgres": pg.insert_many, "neo4j": neo4j.insert_many})
+
+def store_prompt(db_choice: str, prompt: str):
+    """Insert a classified prompt, through the write-behind buffer when enabled"""
+    if write_buffer is not None:
+        return write_buffer.submit(db_choice, {"name": prompt}).result()
+    return router.insert(db_choice, {"name": prompt})
 
 @app.get("/health")
 def health_check():
     """Health check endpoint for Docker"""
     return {"status": "healthy", "service": "mcp_server"}
 
-@app.get("/resources")
-def list_resources():
-    """List all resources from both databases"""
+@app.get("/stats")
+def get_stats():
+    """Runtime statistics for the classification pipeline and database access"""
+    return {
+        "classification_cache": classification_cache.stats(),
+        "local_classifier": local_classifier.stats(),
+        "single_flight": classification_flight.stats(),
+        "batching": classification_batcher.stats() if classification_batcher else {"enabled": False},
+        "postgres_pool": pg.stats(),
+        "postgres_cursors": pg.cursors.stats(),
+        "neo4j_cursors": neo4j.cursors.stats(),
+        "query_cache": query_cache.stats(),
+        "query_guard": query_guard.stats(),
+        "write_behind": write_buffer.stats() if write_buffer else {"enabled": False},
+    }
+
+@app.delete("/classification_cache")
+def flush_classification_cache():
+    """Flush the prompt classification cache"""
+    return {"flushed": classification_cache.clear()}
+
+@app.delete("/query_cache")
+def flush_query_cache():
+    """Flush cached query results"""
+    return {"flushed": query_cache.clear()}
+
+RESOURCE_TIMEOUTS = {
+    "postgres": float(os.getenv("RESOURCES_POSTGRES_TIMEOUT", "5")),
+    "neo4j": float(os.getenv("RESOURCES_NEO4J_TIMEOUT", "5")),
+}
+
+async def read_resources(backend: str, query: str, use_cache: bool = True):
+    """Run one backend's resource query; returns (rows, error, elapsed milliseconds)"""
+    started = time.perf_counter()
     try:
-        # Get resources from PostgreSQL
-        context.switch(pg)
-        pg_resources = context.read("SELECT * FROM prompts LIMIT 100")
-        
-        # Get resources from Neo4j
-        context.switch(neo4j)
-        neo4j_resources = context.read("MATCH (n:Prompt) RETURN n LIMIT 100")
-        
-        return {
-            "postgres_resources": pg_resources,
-            "neo4j_resources": neo4j_resources
-        }
+        rows = await asyncio.wait_for(
+            asyncio.to_thread(router.read, backend, query, use_cache=use_cache), RESOURCE_TIMEOUTS[backend]
+        )
+        error = None
+    except asyncio.TimeoutError:
+        rows, error = None, f"Timed out after {RESOURCE_TIMEOUTS[backend]}s"
     except Exception as e:
-        return {"error": str(e)}
+        rows, error = None, str(e)
+    return rows, error, round((time.perf_counter() - started) * 1000, 1)
+
+@app.get("/resources")
+async def list_resources(request: Request, response: Response, since: Optional[str] = None):
+    """List resources from both databases
+    
+    Both backends are read concurrently, each with its own timeout; a slow or
+    failing backend is reported under "errors" while the other's rows are returned.
+    Pass the returned "since" cursor back to receive only newer rows, and the
+    ETag as If-None-Match to get a 304 when nothing has changed.
+    """
+    try:
+        cursor = parse_since(since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Heads first: a cheap max(id) per backend decides whether any rows need reading. They bypass
+    # the query cache, which only sees this process's writes, so the ETag always reflects the database
+    head_results = await asyncio.gather(
+        *(read_resources(backend, RESOURCE_HEAD_QUERIES[backend], use_cache=False) for backend in RESOURCE_BACKENDS)
+    )
+    heads = {backend: head_value(rows) for backend, (rows, error, _) in zip(RESOURCE_BACKENDS, head_results)
+             if not error}
+    errors = {backend: error for backend, (_, error, _) in zip(RESOURCE_BACKENDS, head_results) if error}
+    etag = None if errors else compute_etag(cursor, heads)
+    if etag and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    async def read_new(backend):
+        if backend in errors:
+            return None, None, 0.0
+        if heads[backend] <= cursor[backend]:
+            return QueryRows(), None, 0.0
+        return await read_resources(backend, rows_query(backend, cursor[backend], until=heads[backend]))
+
+    results = await asyncio.gather(*(read_new(backend) for backend in RESOURCE_BACKENDS))
+    body = {f"{backend}_resources": rows for backend, (rows, _, _) in zip(RESOURCE_BACKENDS, results)}
+    next_cursor = dict(cursor)
+    for backend, (rows, error, _) in zip(RESOURCE_BACKENDS, results):
+        if error:
+            errors[backend] = error
+        elif rows is not None:
+            next_cursor[backend] = last_id(rows, cursor[backend])
+    body["cursor"] = next_cursor
+    body["since"] = format_since(next_cursor)
+    body["timings_ms"] = {backend: round(head[2] + rows[2], 1)
+                          for backend, head, rows in zip(RESOURCE_BACKENDS, head_results, results)}
+    if errors:
+        body["errors"] = errors
+    else:
+        response.headers["ETag"] = etag
+    return body
 
 @app.get("/tools")
 def list_tools():
@@ -65,6 +175,10 @@ def list_tools():
                         "prompt": {
                             "type": "string",
                             "description": "The prompt to classify and store"
+                        },
+                        "bypass_cache": {
+                            "type": "boolean",
+                            "description": "Skip the classification cache and ask the model again"
                         }
                     },
                     "required": ["prompt"]
@@ -79,6 +193,19 @@ def list_tools():
                         "query": {
                             "type": "string",
                             "description": "SQL query to execute"
+                        },
+                        "page_size": {
+                            "type": "integer",
+                            "description": "Stream the result through a server-side cursor, this many rows per page"
+                        },
+                        "continuation_token": {
+                            "type": "string",
+                            "description": "next_token from the previous page, sent with the same query to fetch the next page"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": list(RESULT_FORMATS),
+                            "description": "Result encoding: text (default), json (compact rows with column names), columnar, csv, arrow or parquet (base64)"
                         }
                     },
                     "required": ["query"]
@@ -93,27 +220,169 @@ def list_tools():
                         "query": {
                             "type": "string",
                             "description": "Cypher query to execute"
+                        },
+                        "page_size": {
+                            "type": "integer",
+                            "description": "Stream records from the open result, this many per page"
+                        },
+                        "continuation_token": {
+                            "type": "string",
+                            "description": "next_token from the previous page, sent with the same query to fetch the next page"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": list(RESULT_FORMATS),
+                            "description": "Result encoding: text (default), json (compact rows with column names), columnar, csv, arrow or parquet (base64)"
                         }
                     },
                     "required": ["query"]
                 }
+            ),
+            Tool(
+                name="federated_query",
+                description="Join a PostgreSQL query with a Neo4j query on a key inside the server and return only the joined (optionally aggregated) rows",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "sql": {
+                            "type": "string",
+                            "description": "SQL query for PostgreSQL"
+                        },
+                        "cypher": {
+                            "type": "string",
+                            "description": "Cypher query for Neo4j"
+                        },
+                        "join_key": {
+                            "type": "string",
+                            "description": "Column present in both results to join on"
+                        },
+                        "sql_key": {
+                            "type": "string",
+                            "description": "Join column of the SQL result when the names differ"
+                        },
+                        "cypher_key": {
+                            "type": "string",
+                            "description": "Join column of the Cypher result when the names differ"
+                        },
+                        "how": {
+                            "type": "string",
+                            "enum": ["inner", "left"],
+                            "description": "inner (default) or left (keep SQL rows without a match)"
+                        },
+                        "select": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Output columns as sql.col, cypher.col or a bare name (default: all)"
+                        },
+                        "group_by": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Columns to group the joined rows by"
+                        },
+                        "aggregates": {
+                            "type": "object",
+                            "additionalProperties": {"type": "string"},
+                            "description": "Output name -> count(*), sum(col), avg(col), min(col) or max(col)"
+                        },
+                        "max_rows": {
+                            "type": "integer",
+                            "description": "Maximum rows to return"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": ["json", "columnar", "csv"],
+                            "description": "Result encoding (default json)"
+                        }
+                    },
+                    "required": ["sql", "cypher"]
+                }
+            ),
+            Tool(
+                name="explain_query",
+                description="Show the condensed execution plan of a PostgreSQL or Neo4j query, with the most expensive operators and index hints",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "database": {
+                            "type": "string",
+                            "enum": ["postgres", "neo4j"],
+                            "description": "Database the query is written for"
+                        },
+                        "query": {
+                            "type": "string",
+                            "description": "SQL or Cypher query to explain"
+                        },
+                        "analyze": {
+                            "type": "boolean",
+                            "description": "Execute the query to get actual timings and row counts (default true; read-only and rolled back)"
+                        },
+                        "top": {
+                            "type": "integer",
+                            "description": "Number of most expensive operators to show (default 5)"
+                        }
+                    },
+                    "required": ["database", "query"]
+                }
             )
-        ]
+        ] + [Tool(**tool) for tool in query_catalog.tools()]
     )
 
 @app.post("/process")
 def process_input(data: PromptRequest):
     try:
-        db_choice = choose_db_from_prompt(data.prompt)
-        if db_choice == "neo4j":
-            context.switch(neo4j)
-        else:
-            context.switch(pg)
-        result = context.insert({"name": data.prompt})
+        db_choice = choose_db_from_prompt(data.prompt, use_cache=not data.bypass_cache)
+        result = store_prompt(db_choice, data.prompt)
         return {"db_used": db_choice, "result": result}
     except Exception as e:
         return {"error": str(e)}
 
+@app.post("/ingest")
+async def bulk_ingest(request: Request, fmt: Optional[str] = Query(None, alias="format")):
+    """Bulk-load prompts from a streamed NDJSON or CSV request body
+    
+    Rows are classified in parallel and loaded in batches while the body is
+    read; the response is the summary counts plus the first per-row errors.
+    """
+    fmt = fmt or detect_format(content_type=request.headers.get("content-type"))
+    if fmt not in BULK_INGEST_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt}")
+    
+    ingestor = BulkIngestor(
+        classify=lambda prompt: asyncio.to_thread(choose_db_from_prompt, prompt),
+        loaders={
+            "postgres": lambda prompts: asyncio.to_thread(pg.copy_insert, prompts),
+            "neo4j": lambda prompts: asyncio.to_thread(neo4j.insert_many, [{"name": p} for p in prompts]),
+        }
+    )
+    
+    # The body is consumed here, in the handler: a streaming response would
+    # compete with the server's disconnect listener for the request's chunks
+    errors = []
+    summary = {}
+    async for event in ingestor.run(iter_lines(request.stream()), fmt):
+        if event["type"] == "error" and len(errors) < BULK_INGEST_MAX_REPORTED_ERRORS:
+            errors.append(event)
+        elif event["type"] == "summary":
+            summary = event
+    summary.pop("type", None)
+    return {**summary, "error_details": errors}
+
+def binary_result(backend: str, rows: List[Any], fmt: str) -> Dict[str, Any]:
+    """Return an arrow/parquet encoded result as an embedded blob resource"""
+    return {
+        "content": [
+            {"type": "text", "text": f"{len(rows)} rows from {backend} encoded as {fmt}"},
+            {
+                "type": "resource",
+                "resource": {
+                    "uri": f"query://{backend}/result.{fmt}",
+                    "mimeType": BINARY_FORMATS[fmt],
+                    "blob": encode_rows(rows, fmt)
+                }
+            }
+        ]
+    }
+
 @app.post("/call_tool")
 def call_tool(request: ToolCallRequest):
     """Call a specific MCP tool"""
@@ -123,12 +392,9 @@ def call_tool(request: ToolCallRequest):
             if not prompt:
                 raise HTTPException(status_code=400, detail="Prompt is required")
                 
-            db_choice = choose_db_from_prompt(prompt)
-            if db_choice == "neo4j":
-                context.switch(neo4j)
-            else:
-                context.switch(pg)
-            result = context.insert({"name": prompt})
+            bypass_cache = bool(request.arguments.get("bypass_cache", False))
+            db_choice = choose_db_from_prompt(prompt, use_cache=not bypass_cache)
+            result = store_prompt(db_choice, prompt)
             return {
                 "content": [
                     {"type": "text", "text": f"Classified as: {db_choice}\nResult: {result}"}
@@ -140,8 +406,18 @@ def call_tool(request: ToolCallRequest):
             if not query:
                 raise HTTPException(status_code=400, detail="Query is required")
                 
-            context.switch(pg)
-            result = context.read(query)
+            page_size = request.arguments.get("page_size")
+            token = request.arguments.get("continuation_token")
+            fmt = check_format(request.arguments.get("format"))
+            if page_size or token:
+                page = pg.read_page(query, token, page_size)
+                result = json.dumps(page, default=str) if fmt == "text" else encode_page(page, fmt)
+            else:
+                result = router.read("postgres", query, guarded=True)
+                if fmt in BINARY_FORMATS:
+                    return binary_result("postgres", result, fmt)
+                if fmt != "text":
+                    result = encode_rows(result, fmt)
             return {
                 "content": [
                     {"type": "text", "text": f"Query result: {result}"}
@@ -153,14 +429,62 @@ def call_tool(request: ToolCallRequest):
             if not query:
                 raise HTTPException(status_code=400, detail="Query is required")
                 
-            context.switch(neo4j)
-            result = context.read(query)
+            page_size = request.arguments.get("page_size")
+            token = request.arguments.get("continuation_token")
+            fmt = check_format(request.arguments.get("format"))
+            if page_size or token:
+                page = neo4j.read_page(query, token, page_size)
+                result = json.dumps(page, default=str) if fmt == "text" else encode_page(page, fmt)
+            else:
+                result = router.read("neo4j", query, guarded=True)
+                if fmt in BINARY_FORMATS:
+                    return binary_result("neo4j", result, fmt)
+                if fmt != "text":
+                    result = encode_rows(result, fmt)
             return {
                 "content": [
                     {"type": "text", "text": f"Query result: {result}"}
                 ]
             }
             
+        elif request.name == "explain_query":
+            query = request.arguments.get("query")
+            if not query:
+                raise HTTPException(status_code=400, detail="Query is required")
+                
+            backend = request.arguments.get("database")
+            summary = explain_query(router.get(backend), backend, query,
+                                    analyze=bool(request.arguments.get("analyze", True)),
+                                    top=int(request.arguments.get("top", 5)))
+            return {
+                "content": [
+                    {"type": "text", "text": f"Query plan: {json.dumps(summary, default=str)}"}
+                ]
+            }
+            
+        elif request.name == "federated_query":
+            join = FederatedJoin.from_arguments(request.arguments)
+            fmt = check_format(request.arguments.get("format") or "json")
+            result = run_federated(
+                lambda: neo4j.open_cursor(request.arguments["cypher"]),
+                lambda: pg.open_cursor(request.arguments["sql"]),
+                join
+            )
+            return {
+                "content": [
+                    {"type": "text", "text": f"Query result: {encode_page(result, fmt)}"}
+                ]
+            }
+            
+        elif request.name in query_catalog:
+            named = query_catalog.get(request.name)
+            result = named.run(router.get(named.backend), request.arguments)
+            return {
+                "content": [
+                    {"type": "text", "text": f"Query result: {json.dumps(result, default=str)}"}
+                ]
+            }
+            
         else:
             raise HTTPException(status_code=404, detail=f"Unknown tool: {request.name}")
             
@@ -4,24 +4,56 @@ MCP Server for Database Classifier
 Implements the Model Context Protocol to classify prompts and route to appropriate databases
 """
 
+import argparse
 import asyncio
+import functools
 import json
 import os
+import signal
 import sys
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional
 from dotenv import load_dotenv
 
 from mcp.server import Server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
 from mcp.server.models import InitializationOptions
 from mcp.server.stdio import stdio_server
 from mcp.types import (
+    BlobResourceContents,
     CallToolResult,
+    EmbeddedResource,
+    ListResourcesRequest,
+    ListResourcesResult,
     ListToolsResult,
+    Resource,
+    ResourceTemplate,
     Tool,
     TextContent,
 )
 
+from .classification_cache import classification_cache, normalize_prompt
+from .query_cache import query_cache
+from .query_catalog import query_catalog
+from .query_guard import query_guard
+from .query_plans import explain_query
+from .federated_query import FederatedJoin, build_table
+from .result_encoding import BINARY_FORMATS, RESULT_FORMATS, check_format, dumps_compact, encode_page, encode_rows
+from .resource_sync import (PROMPT_RESOURCE_HEAD_QUERIES, PROMPT_RESOURCE_ITEM_QUERIES, PROMPT_RESOURCE_QUERIES,
+                            PROMPT_RESOURCE_URIS, RESOURCE_BACKENDS, RESOURCE_PAGE_SIZE, format_since, head_value,
+                            last_id, parse_resource_uri, parse_since, resource_notifier, rows_query)
+from .postgres_db import PostgresDB
+from .neo4j_db import Neo4jDB
+from .local_classifier import local_classifier
+from .single_flight import classification_flight
+from .classification_batcher import build_batch_messages, create_batcher_from_env, parse_batch_labels
+from .write_behind import create_write_buffer_from_env
+from .bulk_ingest import (BULK_INGEST_FORMATS, BULK_INGEST_MAX_REPORTED_ERRORS, BulkIngestor, detect_format,
+                          iter_file_chunks, iter_lines, resolve_ingest_path)
+from .socket_transport import MCP_HOST, MCP_PORT, MCP_SOCKET_PATH, MCP_TRANSPORT, MCP_TRANSPORTS, SocketTransport
+
 # Set up logging
 log_dir = os.path.expanduser("~/mcp_server_logs")
 os.makedirs(log_dir, exist_ok=True)
@@ -52,34 +84,163 @@ logger.info("Environment variables loaded")
 server = Server("database-classifier")
 
 # Database connections
+# Postgres calls are bounded by the connection pool size by default; the Neo4j
+# driver manages its own connection pool
+POSTGRES_MAX_CONCURRENCY = int(os.getenv("POSTGRES_MAX_CONCURRENCY", os.getenv("POSTGRES_POOL_MAX", "10")))
+NEO4J_MAX_CONCURRENCY = int(os.getenv("NEO4J_MAX_CONCURRENCY", "8"))
+
 class DatabaseManager:
+    """Async data-access layer over the blocking Postgres and Neo4j drivers
+    
+    Each call runs on a bounded thread pool, gated by a per-database semaphore,
+    so a slow query no longer freezes the event loop and concurrent JSON-RPC
+    requests on one stdio session can run in parallel.
+    """
     def __init__(self):
-        self.postgres_conn = None
-        self.neo4j_driver = None
+        self.postgres = None
+        self.neo4j = None
+        self._connect_lock = threading.Lock()
+        self._limits = {
+            "postgres": asyncio.Semaphore(POSTGRES_MAX_CONCURRENCY),
+            "neo4j": asyncio.Semaphore(NEO4J_MAX_CONCURRENCY),
+        }
+        self._in_flight = {"postgres": 0, "neo4j": 0}
+        self._executor = ThreadPoolExecutor(
+            max_workers=POSTGRES_MAX_CONCURRENCY + NEO4J_MAX_CONCURRENCY,
+            thread_name_prefix="db"
+        )
     
-    async def get_postgres_connection(self):
-        if not self.postgres_conn:
-            import psycopg2
-            self.postgres_conn = psycopg2.connect(
-                dbname=os.getenv("POSTGRES_DB", "mcp_db"),
-                user=os.getenv("POSTGRES_USER", "mcp_user"),
-                password=os.getenv("POSTGRES_PASSWORD", "secret"),
-                host=os.getenv("POSTGRES_HOST", "localhost"),
-                port=int(os.getenv("POSTGRES_PORT", "5432"))
-            )
-        return self.postgres_conn
+    def get_postgres(self) -> PostgresDB:
+        with self._connect_lock:
+            if not self.postgres:
+                postgres = PostgresDB()
+                postgres.connect()
+                self.postgres = postgres
+        return self.postgres
+    
+    def get_neo4j(self) -> Neo4jDB:
+        with self._connect_lock:
+            if not self.neo4j:
+                neo4j = Neo4jDB()
+                neo4j.connect()
+                self.neo4j = neo4j
+        return self.neo4j
+    
+    def get_db(self, backend: str):
+        return self.get_neo4j() if backend == "neo4j" else self.get_postgres()
     
-    async def get_neo4j_driver(self):
-        if not self.neo4j_driver:
-            from neo4j import GraphDatabase
-            uri = os.getenv("NEO4J_URI", "bolt://localhost:7688")
-            user = os.getenv("NEO4J_USER", "neo4j")
-            password = os.getenv("NEO4J_PASSWORD", "test12345")
-            self.neo4j_driver = GraphDatabase.driver(uri, auth=(user, password))
-        return self.neo4j_driver
+    async def run(self, backend: str, fn, *args):
+        """Run a blocking call for a backend on the executor, within its concurrency limit"""
+        async with self._limits[backend]:
+            self._in_flight[backend] += 1
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, functools.partial(fn, *args))
+            finally:
+                self._in_flight[backend] -= 1
+    
+    async def insert(self, backend: str, data: dict) -> str:
+        return await self.run(backend, lambda: notify_write(backend, self.get_db(backend).insert(data)))
+    
+    async def read(self, backend: str, query: str, guarded: bool = False, use_cache: bool = True) -> Any:
+        return await self.run(backend, lambda: self.get_db(backend).read(query, guarded=guarded, use_cache=use_cache))
+    
+    async def prewarm(self):
+        """Open database connections before the first tool call"""
+        for backend in ("postgres", "neo4j"):
+            try:
+                await self.run(backend, self.get_db, backend)
+            except Exception as e:
+                logger.warning(f"Could not prewarm {backend} connections: {e}")
+    
+    def stats(self) -> Dict[str, Any]:
+        stats = {
+            backend: {"in_flight": self._in_flight[backend], "max_concurrency": limit}
+            for backend, limit in (("postgres", POSTGRES_MAX_CONCURRENCY), ("neo4j", NEO4J_MAX_CONCURRENCY))
+        }
+        stats["postgres"]["pool"] = self.postgres.stats() if self.postgres else None
+        stats["postgres"]["cursors"] = self.postgres.cursors.stats() if self.postgres else None
+        stats["neo4j"]["cursors"] = self.neo4j.cursors.stats() if self.neo4j else None
+        return stats
+    
+    def close(self):
+        self._executor.shutdown(wait=False)
+        if self.postgres:
+            self.postgres.close()
+        if self.neo4j:
+            self.neo4j.close()
 
 db_manager = DatabaseManager()
 
+def notify_write(backend: str, result: Any) -> Any:
+    """Pass a committed write's result through, notifying resource subscribers (any thread)"""
+    resource_notifier.changed(backend)
+    return result
+
+# Opt-in (WRITE_BEHIND_ENABLED); flushes run on the buffer's own thread
+write_buffer = create_write_buffer_from_env({
+    "postgres": lambda rows: notify_write("postgres", db_manager.get_postgres().insert_many(rows)),
+    "neo4j": lambda rows: notify_write("neo4j", db_manager.get_neo4j().insert_many(rows)),
+})
+
+# Azure OpenAI client settings
+AZURE_CONNECT_TIMEOUT = float(os.getenv("AZURE_CONNECT_TIMEOUT", "5"))
+AZURE_READ_TIMEOUT = float(os.getenv("AZURE_READ_TIMEOUT", "30"))
+AZURE_MAX_CONCURRENCY = int(os.getenv("AZURE_MAX_CONCURRENCY", "16"))
+
+class AzureClientManager:
+    """One long-lived async Azure OpenAI client shared by all tool calls
+    
+    Keeps HTTP connections alive between calls so TLS handshakes are paid once,
+    and bounds the number of concurrent chat completions.
+    """
+    def __init__(self):
+        self.client = None
+        self.loop = None
+        self._semaphore = None
+    
+    def get_client(self):
+        if not self.client:
+            import httpx
+            from openai import AsyncAzureOpenAI
+            self.loop = asyncio.get_running_loop()
+            self._semaphore = asyncio.Semaphore(AZURE_MAX_CONCURRENCY)
+            self.client = AsyncAzureOpenAI(
+                api_key=os.getenv("AZURE_API_KEY"),
+                api_version=os.getenv("AZURE_API_VERSION", "2023-05-15"),
+                azure_endpoint=os.getenv("AZURE_API_BASE"),
+                http_client=httpx.AsyncClient(
+                    timeout=httpx.Timeout(AZURE_READ_TIMEOUT, connect=AZURE_CONNECT_TIMEOUT),
+                    limits=httpx.Limits(
+                        max_connections=AZURE_MAX_CONCURRENCY,
+                        max_keepalive_connections=AZURE_MAX_CONCURRENCY,
+                        keepalive_expiry=60
+                    )
+                )
+            )
+        return self.client
+    
+    async def complete(self, messages: List[Dict[str, str]]) -> str:
+        """Run a chat completion and return the message text"""
+        client = self.get_client()
+        async with self._semaphore:
+            response = await client.chat.completions.create(
+                model=os.getenv("AZURE_DEPLOYMENT"),
+                messages=messages
+            )
+        return response.choices[0].message.content
+    
+    def complete_from_thread(self, messages: List[Dict[str, str]]) -> str:
+        """Run complete() on the server's event loop from a worker thread"""
+        return asyncio.run_coroutine_threadsafe(self.complete(messages), self.loop).result()
+    
+    async def close(self):
+        if self.client:
+            await self.client.close()
+            self.client = None
+
+azure_manager = AzureClientManager()
+
 @server.list_tools()
 async def handle_list_tools() -> ListToolsResult:
     """List available tools"""
@@ -94,6 +255,10 @@ async def handle_list_tools() -> ListToolsResult:
                         "prompt": {
                             "type": "string",
                             "description": "The prompt to classify and store"
+                        },
+                        "bypass_cache": {
+                            "type": "boolean",
+                            "description": "Skip the classification cache and ask the model again"
                         }
                     },
                     "required": ["prompt"]
@@ -108,6 +273,19 @@ async def handle_list_tools() -> ListToolsResult:
                         "query": {
                             "type": "string",
                             "description": "SQL query to execute"
+                        },
+                        "page_size": {
+                            "type": "integer",
+                            "description": "Stream the result through a server-side cursor, this many rows per page"
+                        },
+                        "continuation_token": {
+                            "type": "string",
+                            "description": "next_token from the previous page, sent with the same query to fetch the next page"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": list(RESULT_FORMATS),
+                            "description": "Result encoding: text (default), json (compact rows with column names), columnar, csv, arrow or parquet (base64)"
                         }
                     },
                     "required": ["query"]
@@ -122,14 +300,256 @@ async def handle_list_tools() -> ListToolsResult:
                         "query": {
                             "type": "string",
                             "description": "Cypher query to execute"
+                        },
+                        "page_size": {
+                            "type": "integer",
+                            "description": "Stream records from the open result, this many per page"
+                        },
+                        "continuation_token": {
+                            "type": "string",
+                            "description": "next_token from the previous page, sent with the same query to fetch the next page"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": list(RESULT_FORMATS),
+                            "description": "Result encoding: text (default), json (compact rows with column names), columnar, csv, arrow or parquet (base64)"
                         }
                     },
                     "required": ["query"]
                 }
+            ),
+            Tool(
+                name="explain_query",
+                description="Show the condensed execution plan of a PostgreSQL or Neo4j query, with the most expensive operators and index hints",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "database": {
+                            "type": "string",
+                            "enum": ["postgres", "neo4j"],
+                            "description": "Database the query is written for"
+                        },
+                        "query": {
+                            "type": "string",
+                            "description": "SQL or Cypher query to explain"
+                        },
+                        "analyze": {
+                            "type": "boolean",
+                            "description": "Execute the query to get actual timings and row counts (default true; read-only and rolled back)"
+                        },
+                        "top": {
+                            "type": "integer",
+                            "description": "Number of most expensive operators to show (default 5)"
+                        }
+                    },
+                    "required": ["database", "query"]
+                }
+            ),
+            Tool(
+                name="federated_query",
+                description="Join a PostgreSQL query with a Neo4j query on a key inside the server and return only the joined (optionally aggregated) rows",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "sql": {
+                            "type": "string",
+                            "description": "SQL query for PostgreSQL"
+                        },
+                        "cypher": {
+                            "type": "string",
+                            "description": "Cypher query for Neo4j"
+                        },
+                        "join_key": {
+                            "type": "string",
+                            "description": "Column present in both results to join on"
+                        },
+                        "sql_key": {
+                            "type": "string",
+                            "description": "Join column of the SQL result when the names differ"
+                        },
+                        "cypher_key": {
+                            "type": "string",
+                            "description": "Join column of the Cypher result when the names differ"
+                        },
+                        "how": {
+                            "type": "string",
+                            "enum": ["inner", "left"],
+                            "description": "inner (default) or left (keep SQL rows without a match)"
+                        },
+                        "select": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Output columns as sql.col, cypher.col or a bare name (default: all)"
+                        },
+                        "group_by": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Columns to group the joined rows by"
+                        },
+                        "aggregates": {
+                            "type": "object",
+                            "additionalProperties": {"type": "string"},
+                            "description": "Output name -> count(*), sum(col), avg(col), min(col) or max(col)"
+                        },
+                        "max_rows": {
+                            "type": "integer",
+                            "description": "Maximum rows to return"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": ["json", "columnar", "csv"],
+                            "description": "Result encoding (default json)"
+                        }
+                    },
+                    "required": ["sql", "cypher"]
+                }
+            ),
+            Tool(
+                name="bulk_ingest",
+                description="Classify and store every prompt in a server-side NDJSON or CSV file",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "path": {
+                            "type": "string",
+                            "description": "Path of the file inside the server's ingest directory (BULK_INGEST_DIR)"
+                        },
+                        "format": {
+                            "type": "string",
+                            "enum": ["ndjson", "csv"],
+                            "description": "Input format (inferred from the file extension if omitted)"
+                        }
+                    },
+                    "required": ["path"]
+                }
+            ),
+            Tool(
+                name="server_stats",
+                description="Show runtime statistics for the classification pipeline and database access",
+                inputSchema={
+                    "type": "object",
+                    "properties": {}
+                }
+            ),
+            Tool(
+                name="flush_classification_cache",
+                description="Flush the prompt classification cache",
+                inputSchema={
+                    "type": "object",
+                    "properties": {}
+                }
             )
-        ]
+        ] + [Tool(**tool) for tool in query_catalog.tools()]
     )
 
+BACKEND_LABELS = {"postgres": "PostgreSQL", "neo4j": "Neo4j"}
+
+def prompt_rows(rows: List[Any]) -> List[Dict[str, Any]]:
+    """Prompt resource rows as {"id", "name"} dicts"""
+    return [row if isinstance(row, dict) else dict(zip(rows.columns, row)) for row in rows]
+
+async def read_prompt_page(backend: str, since: int) -> List[Any]:
+    """The prompts after since, up to the current head
+    
+    The head is read uncached: the query cache only sees this process's writes,
+    and prompts stored by the HTTP app or another server process must show up.
+    Bounding the page by it keeps each cached page a fixed range of rows.
+    """
+    head = head_value(await db_manager.read(backend, PROMPT_RESOURCE_HEAD_QUERIES[backend], use_cache=False))
+    if head <= since:
+        return []
+    return await db_manager.read(backend, rows_query(backend, since, queries=PROMPT_RESOURCE_QUERIES, until=head))
+
+@server.list_resources()
+async def handle_list_resources(request: ListResourcesRequest) -> ListResourcesResult:
+    """List stored prompts as resources, RESOURCE_PAGE_SIZE per database per page
+    
+    The cursor is the last id seen per database, so pages stay stable while
+    new prompts are stored.
+    """
+    resource_notifier.listen(server.request_context.session)
+    since = request.params.cursor if request.params else None
+    cursor = parse_since(since)
+    
+    resources = []
+    if not since:
+        resources = [
+            Resource(
+                uri=PROMPT_RESOURCE_URIS[backend],
+                name=f"{BACKEND_LABELS[backend]} prompts",
+                description=f"Prompts stored in {BACKEND_LABELS[backend]}; subscribe for updates, "
+                            f"read with ?since=<id> for new ones",
+                mimeType="application/json"
+            )
+            for backend in RESOURCE_BACKENDS
+        ]
+    
+    pages = await asyncio.gather(*(read_prompt_page(backend, cursor[backend]) for backend in RESOURCE_BACKENDS),
+                                 return_exceptions=True)
+    next_cursor = dict(cursor)
+    more = False
+    for backend, rows in zip(RESOURCE_BACKENDS, pages):
+        if isinstance(rows, Exception):
+            logger.warning(f"Could not list {backend} resources: {rows}")
+            continue
+        for row in prompt_rows(rows):
+            resources.append(Resource(
+                uri=f"{PROMPT_RESOURCE_URIS[backend]}/{row['id']}",
+                name=str(row["name"])[:80],
+                description=f"Prompt stored in {BACKEND_LABELS[backend]}",
+                mimeType="application/json"
+            ))
+        next_cursor[backend] = last_id(rows, cursor[backend])
+        more = more or len(rows) >= RESOURCE_PAGE_SIZE
+    return ListResourcesResult(resources=resources, nextCursor=format_since(next_cursor) if more else None)
+
+@server.list_resource_templates()
+async def handle_list_resource_templates() -> List[ResourceTemplate]:
+    """Templates for single prompts and for prompts added after an id"""
+    templates = []
+    for backend in RESOURCE_BACKENDS:
+        uri, label = PROMPT_RESOURCE_URIS[backend], BACKEND_LABELS[backend]
+        templates.append(ResourceTemplate(uriTemplate=f"{uri}/{{id}}", name=f"{label} prompt",
+                                          mimeType="application/json"))
+        templates.append(ResourceTemplate(uriTemplate=f"{uri}{{?since}}", name=f"{label} prompts since",
+                                          mimeType="application/json"))
+    return templates
+
+@server.read_resource()
+async def handle_read_resource(uri) -> List[ReadResourceContents]:
+    """Read one stored prompt, or a page of the prompts added after ?since="""
+    backend, item_id, since = parse_resource_uri(str(uri))
+    if item_id is not None:
+        # Uncached, so a prompt stored elsewhere is not "not found" until the cache expires
+        rows = await db_manager.read(backend, PROMPT_RESOURCE_ITEM_QUERIES[backend].format(id=item_id),
+                                     use_cache=False)
+        if not rows:
+            raise ValueError(f"Resource not found: {uri}")
+        body = dumps_compact(prompt_rows(rows)[0])
+    else:
+        rows = await read_prompt_page(backend, since)
+        after = last_id(rows, since)
+        body = dumps_compact({
+            "prompts": prompt_rows(rows),
+            "since": after,
+            "next": f"{PROMPT_RESOURCE_URIS[backend]}?since={after}" if len(rows) >= RESOURCE_PAGE_SIZE else None,
+        })
+    return [ReadResourceContents(content=body, mime_type="application/json")]
+
+@server.subscribe_resource()
+async def handle_subscribe_resource(uri) -> None:
+    """Send notifications/resources/updated for a prompt collection whenever it is written to"""
+    backend, item_id, _ = parse_resource_uri(str(uri))
+    # Stored prompts are never modified, so only the collections change
+    target = PROMPT_RESOURCE_URIS[backend] if item_id is None else str(uri)
+    resource_notifier.subscribe(target, server.request_context.session)
+
+@server.unsubscribe_resource()
+async def handle_unsubscribe_resource(uri) -> None:
+    backend, item_id, _ = parse_resource_uri(str(uri))
+    target = PROMPT_RESOURCE_URIS[backend] if item_id is None else str(uri)
+    resource_notifier.unsubscribe(target, server.request_context.session)
+
 @server.call_tool()
 async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> CallToolResult:
     """Handle tool calls"""
@@ -140,6 +560,18 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> CallToolResu
         return await handle_query_postgres(arguments)
     elif name == "query_neo4j":
         return await handle_query_neo4j(arguments)
+    elif name == "explain_query":
+        return await handle_explain_query(arguments)
+    elif name == "federated_query":
+        return await handle_federated_query(arguments)
+    elif name == "bulk_ingest":
+        return await handle_bulk_ingest(arguments)
+    elif name == "server_stats":
+        return await handle_server_stats(arguments)
+    elif name == "flush_classification_cache":
+        return await handle_flush_classification_cache(arguments)
+    elif name in query_catalog:
+        return await handle_named_query(name, arguments)
     else:
         return CallToolResult(
             content=[
@@ -153,26 +585,10 @@ async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> CallToolResu
 async def handle_classify_and_store(arguments: Dict[str, Any]) -> CallToolResult:
     """Classify prompt and store in appropriate database"""
     prompt = arguments.get("prompt", "")
+    bypass_cache = bool(arguments.get("bypass_cache", False))
     
     try:
-        # Use Azure OpenAI to classify the prompt
-        from openai import AzureOpenAI
-        
-        client = AzureOpenAI(
-            api_key=os.getenv("AZURE_API_KEY"),
-            api_version="2023-05-15",
-            azure_endpoint=os.getenv("AZURE_API_BASE")
-        )
-        
-        response = client.chat.completions.create(
-            model=os.getenv("AZURE_DEPLOYMENT"),
-            messages=[
-                {"role": "system", "content": "You are a classifier. Respond only with 'postgres' or 'neo4j'."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        db_choice = response.choices[0].message.content.strip().lower()
+        db_choice = await classify_prompt(prompt, bypass_cache)
         
         # Store data in the chosen database
         if db_choice == "neo4j":
@@ -199,37 +615,91 @@ async def handle_classify_and_store(arguments: Dict[str, Any]) -> CallToolResult
             ]
         )
 
+async def classify_prompt(prompt: str, bypass_cache: bool = False) -> str:
+    """Classify a prompt via the cache, the local model, then Azure OpenAI"""
+    db_choice = None if bypass_cache else classification_cache.get(prompt)
+    if db_choice is None:
+        db_choice = local_classifier.classify(prompt)
+    if db_choice is None:
+        # Identical prompts arriving concurrently share one Azure call
+        db_choice = await classification_flight.do_async(normalize_prompt(prompt), classify_with_llm, prompt)
+    return db_choice
+
+async def classify_with_llm(prompt: str) -> str:
+    """Use Azure OpenAI to classify the prompt"""
+    if classification_batcher is not None:
+        # Bind the client to this loop before batcher threads call back into it
+        azure_manager.get_client()
+        db_choice = await asyncio.wrap_future(classification_batcher.submit(prompt))
+    else:
+        content = await azure_manager.complete(classification_messages(prompt))
+        db_choice = content.strip().lower()
+    
+    if db_choice in ("postgres", "neo4j"):
+        classification_cache.put(prompt, db_choice)
+    return db_choice
+
+def classification_messages(prompt: str) -> List[Dict[str, str]]:
+    """Chat messages that classify a single prompt"""
+    return [
+        {"role": "system", "content": "You are a classifier. Respond only with 'postgres' or 'neo4j'."},
+        {"role": "user", "content": prompt}
+    ]
+
+def request_classification(prompt: str) -> str:
+    """Classify a single prompt (called from batcher threads)"""
+    return azure_manager.complete_from_thread(classification_messages(prompt)).strip().lower()
+
+def request_batch_classification(prompts: List[str]) -> List[Optional[str]]:
+    """Classify several prompts with one chat completion (called from batcher threads)"""
+    content = azure_manager.complete_from_thread(build_batch_messages(prompts))
+    return parse_batch_labels(content, len(prompts))
+
+# Opt-in (CLASSIFICATION_BATCH_ENABLED); None means one request per prompt
+classification_batcher = create_batcher_from_env(request_batch_classification, request_classification)
+
 async def store_in_postgres(data: str) -> str:
     """Store data in PostgreSQL"""
-    conn = await db_manager.get_postgres_connection()
-    with conn.cursor() as cur:
-        cur.execute("CREATE TABLE IF NOT EXISTS users (id SERIAL PRIMARY KEY, name TEXT);")
-        cur.execute("INSERT INTO users (name) VALUES (%s);", (data,))
-        conn.commit()
+    if write_buffer is not None:
+        await asyncio.wrap_future(write_buffer.submit("postgres", {"name": data}))
+        return "Stored in PostgreSQL" if write_buffer.acks_after_flush else "Queued for PostgreSQL"
+    await db_manager.insert("postgres", {"name": data})
     return "Stored in PostgreSQL"
 
 async def store_in_neo4j(data: str) -> str:
     """Store data in Neo4j"""
-    driver = await db_manager.get_neo4j_driver()
-    with driver.session() as session:
-        session.run("MERGE (p:Person {name: $name})", name=data)
+    if write_buffer is not None:
+        await asyncio.wrap_future(write_buffer.submit("neo4j", {"name": data}))
+        return "Stored in Neo4j" if write_buffer.acks_after_flush else "Queued for Neo4j"
+    await db_manager.insert("neo4j", {"name": data})
     return "Stored in Neo4j"
 
 async def handle_query_postgres(arguments: Dict[str, Any]) -> CallToolResult:
     """Query PostgreSQL database"""
     query = arguments.get("query", "")
+    page_size = arguments.get("page_size")
+    token = arguments.get("continuation_token")
     
     try:
-        conn = await db_manager.get_postgres_connection()
-        with conn.cursor() as cur:
-            cur.execute(query)
-            results = cur.fetchall()
+        fmt = check_format(arguments.get("format"))
+        if page_size or token:
+            # Paged mode: one bounded page per call, resumed by continuation token
+            page = await db_manager.run(
+                "postgres", lambda: db_manager.get_postgres().read_page(query, token, page_size))
+            body = json.dumps(page, default=str) if fmt == "text" else encode_page(page, fmt)
+            text = f"PostgreSQL Query Results:\n{body}"
+        else:
+            results = await db_manager.read("postgres", query, guarded=True)
+            if fmt in BINARY_FORMATS:
+                return binary_result("postgres", results, fmt)
+            body = json.dumps(results, indent=2) if fmt == "text" else encode_rows(results, fmt)
+            text = f"PostgreSQL Query Results:\n{body}"
         
         return CallToolResult(
             content=[
                 TextContent(
                     type="text",
-                    text=f"PostgreSQL Query Results:\n{json.dumps(results, indent=2)}"
+                    text=text
                 )
             ]
         )
@@ -246,18 +716,29 @@ async def handle_query_postgres(arguments: Dict[str, Any]) -> CallToolResult:
 async def handle_query_neo4j(arguments: Dict[str, Any]) -> CallToolResult:
     """Query Neo4j database"""
     query = arguments.get("query", "")
+    page_size = arguments.get("page_size")
+    token = arguments.get("continuation_token")
     
     try:
-        driver = await db_manager.get_neo4j_driver()
-        with driver.session() as session:
-            result = session.run(query)
-            results = [record.data() for record in result]
+        fmt = check_format(arguments.get("format"))
+        if page_size or token:
+            # Paged mode: one bounded page per call, resumed by continuation token
+            page = await db_manager.run(
+                "neo4j", lambda: db_manager.get_neo4j().read_page(query, token, page_size))
+            body = json.dumps(page, default=str) if fmt == "text" else encode_page(page, fmt)
+            text = f"Neo4j Query Results:\n{body}"
+        else:
+            results = await db_manager.read("neo4j", query, guarded=True)
+            if fmt in BINARY_FORMATS:
+                return binary_result("neo4j", results, fmt)
+            body = json.dumps(results, indent=2) if fmt == "text" else encode_rows(results, fmt)
+            text = f"Neo4j Query Results:\n{body}"
         
         return CallToolResult(
             content=[
                 TextContent(
                     type="text",
-                    text=f"Neo4j Query Results:\n{json.dumps(results, indent=2)}"
+                    text=text
                 )
             ]
         )
@@ -271,32 +752,295 @@ async def handle_query_neo4j(arguments: Dict[str, Any]) -> CallToolResult:
             ]
         )
 
-async def main():
-    """Main function to run the MCP server"""
+async def handle_explain_query(arguments: Dict[str, Any]) -> CallToolResult:
+    """Explain a query and return its condensed plan"""
+    backend = arguments.get("database", "")
+    query = arguments.get("query", "")
+    analyze = bool(arguments.get("analyze", True))
+    top = int(arguments.get("top", 5))
+    
+    try:
+        if backend not in ("postgres", "neo4j"):
+            raise ValueError(f"Unknown database: {backend}")
+        summary = await db_manager.run(
+            backend, lambda: explain_query(db_manager.get_db(backend), backend, query, analyze, top))
+        
+        return CallToolResult(
+            content=[
+                TextContent(
+                    type="text",
+                    text=f"Query Plan:\n{json.dumps(summary, indent=2, default=str)}"
+                )
+            ]
+        )
+    except Exception as e:
+        return CallToolResult(
+            content=[
+                TextContent(
+                    type="text",
+                    text=f"Explain Error: {str(e)}"
+                )
+            ]
+        )
+
+async def handle_federated_query(arguments: Dict[str, Any]) -> CallToolResult:
+    """Join a SQL result with a Cypher result inside the server"""
+    try:
+        join = FederatedJoin.from_arguments(arguments)
+        fmt = check_format(arguments.get("format") or "json")
+        
+        # Collect the Cypher side while the SQL query starts on its own cursor
+        built, probe = await asyncio.gather(
+            db_manager.run("neo4j", lambda: build_table(
+                db_manager.get_neo4j().open_cursor(arguments["cypher"]), join.cypher_key)),
+            db_manager.run("postgres", lambda: db_manager.get_postgres().open_cursor(arguments["sql"])),
+            return_exceptions=True
+        )
+        if isinstance(probe, BaseException):
+            raise probe
+        if isinstance(built, BaseException):
+            probe.close()
+            raise built
+        result = await db_manager.run("postgres", lambda: join.run(probe, *built))
+        
+        return CallToolResult(
+            content=[
+                TextContent(
+                    type="text",
+                    text=f"Federated Query Results:\n{encode_page(result, fmt)}"
+                )
+            ]
+        )
+    except Exception as e:
+        return CallToolResult(
+            content=[
+                TextContent(
+                    type="text",
+                    text=f"Federated Query Error: {str(e)}"
+                )
+            ]
+        )
+
+def binary_result(backend: str, results: List[Any], fmt: str) -> CallToolResult:
+    """Return an arrow/parquet encoded result as an embedded blob resource"""
+    return CallToolResult(
+        content=[
+            TextContent(
+                type="text",
+                text=f"{len(results)} rows from {backend} encoded as {fmt}"
+            ),
+            EmbeddedResource(
+                type="resource",
+                resource=BlobResourceContents(
+                    uri=f"query://{backend}/result.{fmt}",
+                    mimeType=BINARY_FORMATS[fmt],
+                    blob=encode_rows(results, fmt)
+                )
+            )
+        ]
+    )
+
+async def handle_named_query(name: str, arguments: Dict[str, Any]) -> CallToolResult:
+    """Run a named query from the catalog as a prepared statement / parameterized Cypher"""
+    query = query_catalog.get(name)
+    
+    try:
+        results = await db_manager.run(
+            query.backend, lambda: query.run(db_manager.get_db(query.backend), arguments))
+        
+        return CallToolResult(
+            content=[
+                TextContent(
+                    type="text",
+                    text=f"{name} Results:\n{json.dumps(results, indent=2, default=str)}"
+                )
+            ]
+        )
+    except Exception as e:
+        return CallToolResult(
+            content=[
+                TextContent(
+                    type="text",
+                    text=f"Named Query Error: {str(e)}"
+                )
+            ]
+        )
+
+async def handle_bulk_ingest(arguments: Dict[str, Any]) -> CallToolResult:
+    """Bulk-load prompts from a server-side file"""
+    path = arguments.get("path", "")
+    fmt = arguments.get("format") or detect_format(name=path)
+    
+    try:
+        if fmt not in BULK_INGEST_FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        path = resolve_ingest_path(path)
+        
+        ingestor = BulkIngestor(
+            classify=classify_prompt,
+            loaders={
+                "postgres": lambda prompts: db_manager.run(
+                    "postgres", lambda: notify_write("postgres", db_manager.get_postgres().copy_insert(prompts))),
+                "neo4j": lambda prompts: db_manager.run(
+                    "neo4j", lambda: notify_write(
+                        "neo4j", db_manager.get_neo4j().insert_many([{"name": p} for p in prompts]))),
+            }
+        )
+        
+        # Report progress if the client asked for it
+        ctx = server.request_context
+        progress_token = ctx.meta.progressToken if ctx.meta else None
+        
+        errors = []
+        summary = {}
+        async for event in ingestor.run(iter_lines(iter_file_chunks(path)), fmt):
+            if event["type"] == "error" and len(errors) < BULK_INGEST_MAX_REPORTED_ERRORS:
+                errors.append(event)
+            elif event["type"] == "progress" and progress_token is not None:
+                await ctx.session.send_progress_notification(progress_token, event["rows"])
+            elif event["type"] == "summary":
+                summary = event
+        
+        text = (
+            f"Ingested {summary.get('rows', 0)} rows: {summary.get('postgres', 0)} into PostgreSQL, "
+            f"{summary.get('neo4j', 0)} into Neo4j, {summary.get('errors', 0)} errors"
+        )
+        if errors:
+            text += f"\nErrors:\n{json.dumps(errors)}"
+        return CallToolResult(
+            content=[
+                TextContent(
+                    type="text",
+                    text=text
+                )
+            ]
+        )
+    except Exception as e:
+        return CallToolResult(
+            content=[
+                TextContent(
+                    type="text",
+                    text=f"Bulk Ingest Error: {str(e)}"
+                )
+            ]
+        )
+
+async def handle_server_stats(arguments: Dict[str, Any]) -> CallToolResult:
+    """Report runtime statistics"""
+    stats = {
+        "classification_cache": classification_cache.stats(),
+        "local_classifier": local_classifier.stats(),
+        "single_flight": classification_flight.stats(),
+        "batching": classification_batcher.stats() if classification_batcher else {"enabled": False},
+        "databases": db_manager.stats(),
+        "query_cache": query_cache.stats(),
+        "query_guard": query_guard.stats(),
+        "resources": resource_notifier.stats(),
+        "write_behind": write_buffer.stats() if write_buffer else {"enabled": False},
+        "transport": socket_transport.stats() if socket_transport else {"transport": "stdio"},
+    }
+    return CallToolResult(
+        content=[
+            TextContent(
+                type="text",
+                text=json.dumps(stats, indent=2)
+            )
+        ]
+    )
+
+async def handle_flush_classification_cache(arguments: Dict[str, Any]) -> CallToolResult:
+    """Flush the prompt classification cache"""
+    removed = classification_cache.clear()
+    return CallToolResult(
+        content=[
+            TextContent(
+                type="text",
+                text=f"Flushed {removed} cached classifications"
+            )
+        ]
+    )
+
+# Set when serving over a socket (--transport tcp/unix)
+socket_transport: Optional[SocketTransport] = None
+
+def initialization_options() -> InitializationOptions:
+    from mcp.server.lowlevel.server import NotificationOptions
+    
+    capabilities = server.get_capabilities(
+        notification_options=NotificationOptions(tools_changed=True, resources_changed=True),
+        experimental_capabilities={}
+    )
+    # The SDK always advertises subscribe=False; subscriptions are handled above
+    capabilities.resources.subscribe = True
+    return InitializationOptions(
+        server_name="database-classifier",
+        server_version="1.0.0",
+        capabilities=capabilities,
+    )
+
+async def run_session(read_stream, write_stream):
+    """Run one MCP session over a pair of message streams"""
+    await server.run(read_stream, write_stream, initialization_options())
+
+async def main(transport: str = MCP_TRANSPORT, host: str = MCP_HOST, port: int = MCP_PORT,
+               socket_path: str = MCP_SOCKET_PATH):
+    """Main function to run the MCP server
+    
+    stdio serves a single session; tcp and unix keep one warm process serving
+    every client that connects.
+    """
+    global socket_transport
     logger.info("Entering main function")
+    loop = asyncio.get_running_loop()
+    task = asyncio.current_task()
+    terminated = False
+    
+    def terminate():
+        # SIGTERM (docker stop; the default action is ignored for PID 1): stop serving
+        # and run the shutdown below so buffered writes are flushed
+        nonlocal terminated
+        terminated = True
+        task.cancel()
+    
+    loop.add_signal_handler(signal.SIGTERM, terminate)
     try:
         # Run the server
-        logger.info("Setting up stdio server")
-        async with stdio_server() as (read_stream, write_stream):
-            from mcp.server.lowlevel.server import NotificationOptions
-            
-            logger.info("Starting MCP server run")
-            await server.run(
-                read_stream,
-                write_stream,
-                InitializationOptions(
-                    server_name="database-classifier",
-                    server_version="1.0.0",
-                    capabilities=server.get_capabilities(
-                        notification_options=NotificationOptions(tools_changed=True),
-                        experimental_capabilities={}
-                    ),
-                ),
-            )
-            logger.info("MCP server run completed")
+        await db_manager.prewarm()
+        resource_notifier.attach(loop)
+        
+        if transport == "stdio":
+            logger.info("Setting up stdio server")
+            async with stdio_server() as (read_stream, write_stream):
+                logger.info("Starting MCP server run")
+                await run_session(read_stream, write_stream)
+                logger.info("MCP server run completed")
+        else:
+            socket_transport = SocketTransport(transport, host=host, port=port, path=socket_path)
+            await socket_transport.serve(run_session)
+    except asyncio.CancelledError:
+        if not terminated:
+            raise
+        task.uncancel()
+        logger.info("Received SIGTERM, shutting down")
     except Exception as e:
         logger.error(f"Error in main function: {e}", exc_info=True)
         raise
+    finally:
+        loop.remove_signal_handler(signal.SIGTERM)
+        await azure_manager.close()
+        if write_buffer is not None:
+            write_buffer.close()
+        db_manager.close()
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Database classifier MCP server")
+    parser.add_argument("--transport", choices=MCP_TRANSPORTS, default=MCP_TRANSPORT,
+                        help="stdio (one session) or a socket serving many sessions")
+    parser.add_argument("--host", default=MCP_HOST, help="TCP bind address")
+    parser.add_argument("--port", type=int, default=MCP_PORT, help="TCP port")
+    parser.add_argument("--socket-path", default=MCP_SOCKET_PATH, help="Unix socket path")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    args = parse_args()
+    asyncio.run(main(args.transport, args.host, args.port, args.socket_path)) 
\ No newline at end of file
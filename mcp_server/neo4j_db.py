@@ -1,29 +1,148 @@
-from neo4j import GraphDatabase
+from contextlib import contextmanager
+from neo4j import READ_ACCESS, GraphDatabase, unit_of_work
 import os
 from dotenv import load_dotenv
 from .db_interface import DatabaseProtocol
+from .schema import migrate_neo4j
+from .result_paging import QUERY_PAGE_SIZE, CursorRegistry, ResultHandle, read_page
+from .query_cache import query_cache
+from .result_encoding import QueryRows
+from .query_guard import QueryRejected, query_guard
 
 load_dotenv()
 
+def _rows(result):
+    return QueryRows((record.data() for record in result), list(result.keys()))
+
+class Neo4jSession:
+    """Request-scoped handle on one driver session"""
+    def __init__(self, session):
+        self.session = session
+
+    def insert(self, data):
+        self.session.run("MERGE (p:Person {name: $name})", name=data["name"]).consume()
+        return "Stored in Neo4j"
+
+    def insert_many(self, rows):
+        """Merge several nodes with a single UNWIND statement"""
+        self.session.run(
+            "UNWIND $names AS name MERGE (p:Person {name: name})",
+            names=[row["name"] for row in rows]
+        ).consume()
+        return "Stored in Neo4j"
+
+    def read(self, query, parameters=None, guard=None):
+        """Run a query; with a guard it runs in a read transaction, with a timeout and after admission"""
+        if guard is None:
+            return _rows(self.session.run(query, parameters))
+
+        @unit_of_work(timeout=guard.neo4j_timeout or None)
+        def work(tx):
+            return _rows(tx.run(guard.prepare_neo4j(tx, query, parameters), parameters))
+
+        return self.session.execute_read(work)
+
 class Neo4jDB(DatabaseProtocol):
     def __init__(self):
         self.driver = None
+        self.schema_version = None
+        self.cursors = CursorRegistry()
 
     def connect(self):
         uri = os.getenv("NEO4J_URI", "bolt://localhost:7688")
         user = os.getenv("NEO4J_USER", "neo4j")
         password = os.getenv("NEO4J_PASSWORD", "test12345")
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        driver = GraphDatabase.driver(uri, auth=(user, password))
+        try:
+            # Constraints and indexes are created here once, never on the write path
+            self.schema_version = migrate_neo4j(driver)
+        except BaseException:
+            # Callers retry connect(); don't leak a driver per attempt
+            driver.close()
+            raise
+        self.driver = driver
 
-    def insert(self, data):
+    @contextmanager
+    def session(self):
         with self.driver.session() as session:
-            session.run("MERGE (p:Person {name: $name})", name=data["name"])
-            return "Stored in Neo4j"
+            yield Neo4jSession(session)
 
-    def read(self, query):
-        with self.driver.session() as session:
-            result = session.run(query)
-            return [record.data() for record in result]
+    def insert(self, data):
+        with self.session() as session:
+            result = session.insert(data)
+        # Bumped after the write is committed so cached reads taken before it are invalidated
+        query_cache.bump("neo4j")
+        return result
+
+    def insert_many(self, rows):
+        with self.session() as session:
+            result = session.insert_many(rows)
+        query_cache.bump("neo4j")
+        return result
+
+    def read(self, query, parameters=None, guarded=False, use_cache=True):
+        """Run a query; guarded=True applies the query guard (for ad-hoc tool queries)
+
+        use_cache=False always reads the database (for freshness probes).
+        """
+        guard = query_guard if guarded else None
+        if not use_cache:
+            return self._read(query, parameters, guard)
+        cache_params = {"parameters": parameters, "guarded": True} if guarded else parameters
+        return query_cache.get_or_load("neo4j", query, lambda: self._read(query, parameters, guard),
+                                       params=cache_params)
+
+    def _read(self, query, parameters=None, guard=None):
+        with self.session() as session:
+            return session.read(query, parameters, guard)
+
+    def explain(self, query, analyze=True):
+        """Return (PROFILE or EXPLAIN plan, analyzed) from a read transaction
+
+        Queries over the guard's cost budget are only planned, never executed.
+        """
+        @unit_of_work(timeout=query_guard.neo4j_timeout or None)
+        def work(tx):
+            profile = analyze
+            try:
+                query_guard.prepare_neo4j(tx, query, allow_limit=False)
+            except QueryRejected:
+                profile = False
+            summary = tx.run(("PROFILE " if profile else "EXPLAIN ") + query).consume()
+            return (summary.profile if profile else summary.plan), profile
+
+        with self.driver.session(default_access_mode=READ_ACCESS) as session:
+            return session.execute_read(work)
+
+    def open_cursor(self, query, page_size=None):
+        """Run a guarded query whose records are pulled from the server in fetch_size batches as pages are read"""
+        session = self.driver.session(fetch_size=page_size or QUERY_PAGE_SIZE, default_access_mode=READ_ACCESS)
+        tx = None
+        try:
+            tx = session.begin_transaction(timeout=query_guard.neo4j_timeout or None)
+            result = tx.run(query_guard.prepare_neo4j(tx, query, allow_limit=False))
+            columns = list(result.keys())
+        except BaseException:
+            if tx is not None:
+                tx.close()
+            session.close()
+            raise
+
+        def fetch(n):
+            return [record.data() for record in result.fetch(n)]
+
+        def close():
+            try:
+                tx.close()
+            finally:
+                session.close()
+
+        return ResultHandle(fetch, close, lambda: columns)
+
+    def read_page(self, query=None, token=None, page_size=None):
+        """Read one page of a query, or the next page of an earlier one by continuation token"""
+        return read_page(self.cursors, lambda: self.open_cursor(query, page_size), token, page_size)
 
     def close(self):
+        self.cursors.close_all()
         self.driver.close()
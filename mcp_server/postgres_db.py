@@ -1,25 +1,28 @@
-import psycopg2
-import os
+import csv
+import io
+import uuid
+import weakref
+from contextlib import contextmanager
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 from .db_interface import DatabaseProtocol
+from .postgres_pool import PostgresPool, create_pool_from_env
+from .schema import migrate_postgres
+from .result_paging import CursorRegistry, ResultHandle, read_page
+from .query_cache import query_cache
+from .result_encoding import QueryRows
+from .query_guard import QueryRejected, query_guard
 
 load_dotenv()
 
-class PostgresDB(DatabaseProtocol):
-    def __init__(self):
-        self.conn = None
+def _rows(cur):
+    """Fetch all rows, keeping the column names from the cursor description"""
+    return QueryRows(cur.fetchall(), [column[0] for column in cur.description] if cur.description else None)
 
-    def connect(self):
-        self.conn = psycopg2.connect(
-            dbname=os.getenv("POSTGRES_DB", "mcp_db"),
-            user=os.getenv("POSTGRES_USER", "mcp_user"),
-            password=os.getenv("POSTGRES_PASSWORD", "secret"),
-            host=os.getenv("POSTGRES_HOST", "localhost"),
-            port=int(os.getenv("POSTGRES_PORT", "5432"))
-        )
-        with self.conn.cursor() as cur:
-            cur.execute("CREATE TABLE IF NOT EXISTS users (id SERIAL PRIMARY KEY, name TEXT);")
-            self.conn.commit()
+class PostgresSession:
+    """Request-scoped handle on one pooled connection"""
+    def __init__(self, conn):
+        self.conn = conn
 
     def insert(self, data):
         with self.conn.cursor() as cur:
@@ -27,10 +30,168 @@ class PostgresDB(DatabaseProtocol):
             self.conn.commit()
             return "Stored in Postgres"
 
-    def read(self, query):
+    def insert_many(self, rows):
+        """Insert several rows with one multi-row INSERT and a single commit"""
         with self.conn.cursor() as cur:
+            execute_values(cur, "INSERT INTO users (name) VALUES %s", [(row["name"],) for row in rows],
+                           page_size=max(len(rows), 1))
+            self.conn.commit()
+            return "Stored in Postgres"
+
+    def copy_insert(self, names):
+        """Bulk-load prompts with COPY, the fastest path for large batches"""
+        data = io.StringIO()
+        writer = csv.writer(data)
+        for name in names:
+            writer.writerow([name])
+        data.seek(0)
+        with self.conn.cursor() as cur:
+            cur.copy_expert("COPY users (name) FROM STDIN WITH (FORMAT csv)", data)
+            self.conn.commit()
+            return f"Copied {len(names)} rows into Postgres"
+
+    def read(self, query, guard=None):
+        """Run a query; with a guard it runs read-only, with a timeout and after admission"""
+        with self.conn.cursor() as cur:
+            if guard is not None:
+                query = guard.prepare_postgres(cur, query)
+            cur.execute(query)
+            return _rows(cur)
+
+    def execute_prepared(self, name, query, param_types, values, prepared):
+        """Run a prepared statement, preparing it first if this connection has not seen it
+
+        prepared is the set of statement names already prepared on this connection.
+        """
+        with self.conn.cursor() as cur:
+            if name not in prepared:
+                types = f" ({', '.join(param_types)})" if param_types else ""
+                cur.execute(f"PREPARE {name}{types} AS {query}")
+                prepared.add(name)
+            if values:
+                cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(values))})", values)
+            else:
+                cur.execute(f"EXECUTE {name}")
+            return _rows(cur)
+
+class PostgresDB(DatabaseProtocol):
+    def __init__(self):
+        self.pool: PostgresPool = None
+        self.schema_version = None
+        self.cursors = CursorRegistry()
+        # Prepared statements live per connection; entries go away with their connection
+        self._prepared = weakref.WeakKeyDictionary()
+
+    def connect(self):
+        pool = create_pool_from_env()
+        try:
+            pool.prewarm()
+            # Tables and indexes are created here once, never on the write path
+            with pool.connection() as conn:
+                self.schema_version = migrate_postgres(conn)
+        except BaseException:
+            # Callers retry connect(); don't leak a pool per attempt
+            pool.close()
+            raise
+        self.pool = pool
+
+    @contextmanager
+    def session(self):
+        with self.pool.connection() as conn:
+            yield PostgresSession(conn)
+
+    def insert(self, data):
+        with self.session() as session:
+            result = session.insert(data)
+        # Bumped after the commit so cached reads taken before it are invalidated
+        query_cache.bump("postgres")
+        return result
+
+    def insert_many(self, rows):
+        with self.session() as session:
+            result = session.insert_many(rows)
+        query_cache.bump("postgres")
+        return result
+
+    def copy_insert(self, names):
+        with self.session() as session:
+            result = session.copy_insert(names)
+        query_cache.bump("postgres")
+        return result
+
+    def read(self, query, guarded=False, use_cache=True):
+        """Run a query; guarded=True applies the query guard (for ad-hoc tool queries)
+
+        use_cache=False always reads the database (for freshness probes).
+        """
+        guard = query_guard if guarded else None
+        if not use_cache:
+            return self._read(query, guard)
+        return query_cache.get_or_load("postgres", query, lambda: self._read(query, guard),
+                                       params={"guarded": True} if guarded else None)
+
+    def _read(self, query, guard=None):
+        with self.session() as session:
+            return session.read(query, guard)
+
+    def execute_prepared(self, name, query, param_types, values):
+        """Run a named query as a server-side prepared statement (planned once per connection)"""
+        def load():
+            with self.pool.connection() as conn:
+                prepared = self._prepared.setdefault(conn, set())
+                return PostgresSession(conn).execute_prepared(name, query, param_types, values, prepared)
+        return query_cache.get_or_load("postgres", query, load, params=[name, *values])
+
+    def explain(self, query, analyze=True):
+        """Return (EXPLAIN JSON document, analyzed) from a read-only, rolled-back transaction
+
+        Queries over the guard's cost budget are only planned, never executed.
+        """
+        # Checked outside the fallback below: a stacked query must never reach EXPLAIN
+        query = query_guard.single_statement(query)
+        with self.pool.connection() as conn:
+            try:
+                with conn.cursor() as cur:
+                    try:
+                        query_guard.prepare_postgres(cur, query, allow_limit=False)
+                    except QueryRejected:
+                        analyze = False
+                    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+                    cur.execute(f"EXPLAIN ({options}) {query}")
+                    return cur.fetchone()[0][0], analyze
+            finally:
+                conn.rollback()
+
+    def open_cursor(self, query):
+        """Run a guarded query on a named server-side cursor that holds its own pooled connection"""
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as guard_cur:
+                query = query_guard.prepare_postgres(guard_cur, query, allow_limit=False)
+            cur = conn.cursor(name=f"query_{uuid.uuid4().hex}")
             cur.execute(query)
-            return cur.fetchall()
+        except BaseException:
+            self.pool.putconn(conn)
+            raise
+
+        def close():
+            try:
+                cur.close()
+            finally:
+                self.pool.putconn(conn)
+
+        def describe():
+            return [column[0] for column in cur.description] if cur.description else None
+
+        return ResultHandle(cur.fetchmany, close, describe)
+
+    def read_page(self, query=None, token=None, page_size=None):
+        """Read one page of a query, or the next page of an earlier one by continuation token"""
+        return read_page(self.cursors, lambda: self.open_cursor(query), token, page_size)
+
+    def stats(self):
+        return self.pool.stats() if self.pool else None
 
     def close(self):
-        self.conn.close()
+        self.cursors.close_all()
+        self.pool.close()
@@ -0,0 +1,245 @@
+"""
+PostgreSQL connection pool
+Thread-safe psycopg2 pool shared by the FastAPI app and the stdio MCP server,
+with health checks on checkout, idle recycling and utilization stats
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("postgres_pool")
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+
+class PostgresPool:
+    """Bounded pool of psycopg2 connections
+
+    Args:
+        connect: Zero-argument factory that opens a new connection
+        min_size: Connections opened by prewarm() and kept through idle recycling
+        max_size: Hard cap on open connections; further checkouts wait
+        max_idle: Seconds an idle connection above min_size is kept before it is closed
+        health_check_after: Idle seconds after which a connection is pinged on checkout
+        timeout: Seconds a checkout waits for a free connection before PoolTimeout
+    """
+
+    def __init__(self, connect: Callable[[], Any], min_size: int = 1, max_size: int = 10,
+                 max_idle: float = 300, health_check_after: float = 30, timeout: float = 30):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        # LIFO so the most recently used (warmest) connection is handed out first
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._size = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.peak_in_use = 0
+        self.created = 0
+        self.recycled = 0
+        self.health_check_failures = 0
+
+    def prewarm(self) -> None:
+        """Open connections up to min_size"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _open(self):
+        conn = self._connect()
+        self.created += 1
+        return conn
+
+    def getconn(self):
+        """Check a healthy connection out of the pool, opening one if below max_size"""
+        deadline = time.monotonic() + self.timeout
+        waited_from = None
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("Connection pool is closed")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        last_used = None
+                        break
+                    if waited_from is None:
+                        waited_from = time.monotonic()
+                        self.waits += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No Postgres connection available within {self.timeout}s")
+                    self._cond.wait(remaining)
+                self._checked_out()
+
+            if conn is None:
+                try:
+                    conn = self._open()
+                except Exception:
+                    self._discard(None)
+                    raise
+            elif not self._healthy(conn, last_used):
+                self.health_check_failures += 1
+                self._discard(conn)
+                continue
+
+            if waited_from is not None:
+                self.wait_time += time.monotonic() - waited_from
+            return conn
+
+    def _checked_out(self) -> None:
+        # Callers hold self._cond
+        self.checkouts += 1
+        self.peak_in_use = max(self.peak_in_use, self._size - len(self._idle))
+
+    def _healthy(self, conn, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        """Return a connection; any open transaction is rolled back"""
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        if discard or conn.closed:
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                conn.close()
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._recycle_idle()
+            self._cond.notify()
+
+    def _discard(self, conn) -> None:
+        if conn is not None and not conn.closed:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _recycle_idle(self) -> None:
+        # Callers hold self._cond; the oldest idle connections sit at the left end
+        cutoff = time.monotonic() - self.max_idle
+        while self._idle and self._size > self.min_size and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self.recycled += 1
+            conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Context manager that checks a connection out and always returns it"""
+        conn = self.getconn()
+        try:
+            yield conn
+        except BaseException:
+            self.putconn(conn, discard=conn.closed)
+            raise
+        else:
+            self.putconn(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool size and utilization counters"""
+        with self._cond:
+            idle = len(self._idle)
+            in_use = self._size - idle
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": idle,
+                "in_use": in_use,
+                "utilization": in_use / self.max_size,
+                "peak_in_use": self.peak_in_use,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "average_wait": self.wait_time / self.waits if self.waits else 0.0,
+                "created": self.created,
+                "recycled": self.recycled,
+                "health_check_failures": self.health_check_failures,
+            }
+
+    def close(self) -> None:
+        """Close idle connections; checked-out ones are closed when returned"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._size -= 1
+                conn.close()
+            self._cond.notify_all()
+
+
+def connect_from_env():
+    """Open a psycopg2 connection using the POSTGRES_* environment variables"""
+    return psycopg2.connect(
+        dbname=os.getenv("POSTGRES_DB", "mcp_db"),
+        user=os.getenv("POSTGRES_USER", "mcp_user"),
+        password=os.getenv("POSTGRES_PASSWORD", "secret"),
+        host=os.getenv("POSTGRES_HOST", "localhost"),
+        port=int(os.getenv("POSTGRES_PORT", "5432"))
+    )
+
+
+def create_pool_from_env(connect: Optional[Callable[[], Any]] = None) -> PostgresPool:
+    """Build a pool configured by the POSTGRES_POOL_* environment variables"""
+    return PostgresPool(
+        connect or connect_from_env,
+        min_size=int(os.getenv("POSTGRES_POOL_MIN", "1")),
+        max_size=int(os.getenv("POSTGRES_POOL_MAX", "10")),
+        max_idle=float(os.getenv("POSTGRES_POOL_MAX_IDLE", "300")),
+        health_check_after=float(os.getenv("POSTGRES_POOL_HEALTH_CHECK_AFTER", "30")),
+        timeout=float(os.getenv("POSTGRES_POOL_TIMEOUT", "30")),
+    )
@@ -0,0 +1,189 @@
+"""
+Query result cache
+Caches read-only query results per (backend, normalized query). Every insert
+bumps that backend's write version, so cached results never outlive a write
+made through this server.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1000"))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Safety net for writes made outside this server (psql, Neo4j browser, other services)
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Statements that are safe to cache: plain reads
+_READ_ONLY = {
+    "postgres": re.compile(r"^\s*(select|with|values|table)\b", re.IGNORECASE),
+    "neo4j": re.compile(r"^\s*(match|optional\s+match|with|unwind|return)\b", re.IGNORECASE),
+}
+_WRITES = {
+    "postgres": re.compile(r"\b(insert|update|delete|merge|into|for\s+(update|share)|nextval|setval)\b", re.IGNORECASE),
+    "neo4j": re.compile(r"\b(create|merge|set|delete|remove|detach|call|load\s+csv|foreach)\b", re.IGNORECASE),
+}
+# Functions whose result changes between calls even when the data does not
+_NON_DETERMINISTIC = re.compile(
+    r"\b(now|random|rand|randomuuid|gen_random_uuid|uuid_generate_v[14]|clock_timestamp|statement_timestamp|"
+    r"timeofday|txid_current|pg_sleep|timestamp|datetime|localdatetime|localtime|date|time)\s*\(|"
+    r"\b(current_timestamp|current_date|current_time|localtimestamp)\b",
+    re.IGNORECASE,
+)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query into a cache key (whitespace collapsed, trailing semicolon dropped)
+
+    Case is preserved because it is significant inside string literals.
+    """
+    return _WHITESPACE.sub(" ", query).strip().rstrip(";").rstrip()
+
+
+def is_write(backend: str, query: str) -> bool:
+    """True unless the query is recognisably read-only"""
+    read_only = _READ_ONLY.get(backend)
+    return read_only is None or not read_only.match(query) or bool(_WRITES[backend].search(query))
+
+
+def is_cacheable(backend: str, query: str) -> bool:
+    """True for deterministic read-only queries"""
+    return not is_write(backend, query) and not _NON_DETERMINISTIC.search(query)
+
+
+class QueryResultCache:
+    """Thread-safe LRU cache of query results, bounded by entry count and total size
+
+    Args:
+        max_entries: Maximum number of cached results
+        max_bytes: Maximum combined JSON size of cached results
+        ttl: Seconds a result stays valid even without writes (0 disables expiry)
+        enabled: When False, every query goes to the database
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 300, enabled: bool = True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        # key -> (write version, result, size, expires_at)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.too_large = 0
+
+    def bump(self, backend: str) -> None:
+        """Record a write to a backend; its cached results become stale"""
+        with self._lock:
+            self._versions[backend] = self._versions.get(backend, 0) + 1
+
+    def get_or_load(self, backend: str, query: str, load: Callable[[], Any],
+                    params: Optional[Any] = None) -> Any:
+        """Return a cached result for the query (and params) or run load() and cache what it returns"""
+        if not self.enabled or not is_cacheable(backend, query):
+            with self._lock:
+                self.bypassed += 1
+            result = load()
+            if is_write(backend, query):
+                # Possibly a write sent through a query tool
+                self.bump(backend)
+            return result
+
+        key = (backend, normalize_query(query), json.dumps(params, sort_keys=True, default=str) if params else None)
+        with self._lock:
+            version = self._versions.get(backend, 0)
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry_version, result, size, expires_at = entry
+                if entry_version == version and (not expires_at or expires_at >= time.monotonic()):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                self._remove(key)
+                if entry_version != version:
+                    self.invalidations += 1
+                else:
+                    self.expirations += 1
+            self.misses += 1
+
+        # Tagged with the version seen before the read, so a write that lands while
+        # the query runs leaves this entry stale rather than wrongly fresh
+        result = load()
+        self._put(key, version, result)
+        return result
+
+    def _put(self, key: tuple, version: int, result: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        size = len(json.dumps(result, default=str))
+        with self._lock:
+            if size > self.max_bytes:
+                self.too_large += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, result, size, time.monotonic() + self.ttl if self.ttl > 0 else 0)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: tuple) -> None:
+        # Callers hold self._lock
+        self._bytes -= self._entries.pop(key)[2]
+
+    def clear(self) -> int:
+        """Flush all entries and return how many were removed"""
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bypassed": self.bypassed,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "too_large": self.too_large,
+                "write_versions": dict(self._versions),
+            }
+
+
+query_cache = QueryResultCache(
+    max_entries=QUERY_CACHE_MAX_ENTRIES,
+    max_bytes=QUERY_CACHE_MAX_BYTES,
+    ttl=QUERY_CACHE_TTL,
+    enabled=QUERY_CACHE_ENABLED,
+)
@@ -0,0 +1,198 @@
+"""
+Named query catalog
+Parameterized queries registered from a JSON file and exposed as tools. Postgres
+entries run as server-side prepared statements (parsed and planned once per
+connection); Neo4j entries run as parameterized Cypher so the server's plan
+cache is reused. Agents send only the parameters.
+
+Catalog file (QUERY_CATALOG_PATH):
+    {
+      "queries": [
+        {
+          "name": "users_by_name",
+          "backend": "postgres",
+          "description": "Users with an exact name",
+          "query": "SELECT id, name FROM users WHERE name = $name LIMIT $limit",
+          "parameters": {
+            "name": {"type": "string", "description": "Name to look up"},
+            "limit": {"type": "integer", "default": 100}
+          }
+        }
+      ]
+    }
+
+Parameters are referenced as $name in both SQL and Cypher.
+"""
+
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+QUERY_CATALOG_PATH = os.getenv("QUERY_CATALOG_PATH", "")
+
+logger = logging.getLogger("query_catalog")
+
+# JSON schema type -> (Postgres type for PREPARE, accepted Python types)
+PARAMETER_TYPES = {
+    "string": ("text", (str,)),
+    "integer": ("bigint", (int,)),
+    "number": ("double precision", (int, float)),
+    "boolean": ("boolean", (bool,)),
+}
+
+# Built-in tool names (both front ends) that catalog entries may not shadow
+RESERVED_TOOL_NAMES = (
+    "classify_and_store", "query_postgres", "query_neo4j", "explain_query", "federated_query",
+    "bulk_ingest", "server_stats", "flush_classification_cache",
+)
+
+_NAME = re.compile(r"^[a-z][a-z0-9_]{0,62}$")
+_PLACEHOLDER = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*)")
+
+
+class NamedQuery:
+    """One catalog entry
+
+    Args:
+        name: Tool name (lowercase identifier)
+        backend: 'postgres' or 'neo4j'
+        query: SQL or Cypher referencing parameters as $name
+        parameters: Parameter name -> {"type", "description", "default"}
+        description: Tool description shown to agents
+    """
+
+    def __init__(self, name: str, backend: str, query: str,
+                 parameters: Optional[Dict[str, Dict[str, Any]]] = None, description: str = ""):
+        if not _NAME.match(name or ""):
+            raise ValueError(f"Invalid query name: {name!r}")
+        if backend not in ("postgres", "neo4j"):
+            raise ValueError(f"Query {name}: unknown backend {backend!r}")
+        self.name = name
+        self.backend = backend
+        self.query = query
+        self.parameters = parameters or {}
+        self.description = description or f"Run the named {backend} query '{name}'"
+        for param, spec in self.parameters.items():
+            if spec.get("type") not in PARAMETER_TYPES:
+                raise ValueError(f"Query {name}: parameter {param} has unsupported type {spec.get('type')!r}")
+        unknown = set(_PLACEHOLDER.findall(query)) - set(self.parameters)
+        if unknown:
+            raise ValueError(f"Query {name}: undeclared parameters {sorted(unknown)}")
+        self.statement_name = f"catalog_{name}"
+        self.order: List[str] = list(self.parameters)
+        if backend == "postgres":
+            # PREPARE takes positional $1..$n placeholders in declaration order
+            positions = {param: i + 1 for i, param in enumerate(self.order)}
+            self.prepared_query = _PLACEHOLDER.sub(lambda m: f"${positions[m.group(1)]}", query)
+            self.parameter_types = [PARAMETER_TYPES[self.parameters[p]["type"]][0] for p in self.order]
+
+    def input_schema(self) -> Dict[str, Any]:
+        """JSON schema for the tool arguments"""
+        properties = {}
+        for param, spec in self.parameters.items():
+            prop = {"type": spec["type"]}
+            for field in ("description", "default", "enum"):
+                if field in spec:
+                    prop[field] = spec[field]
+            properties[param] = prop
+        return {
+            "type": "object",
+            "properties": properties,
+            "required": [p for p, spec in self.parameters.items() if "default" not in spec],
+        }
+
+    def bind(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate tool arguments and fill in defaults"""
+        unknown = set(arguments) - set(self.parameters)
+        if unknown:
+            raise ValueError(f"Unknown parameters for {self.name}: {sorted(unknown)}")
+        values = {}
+        for param, spec in self.parameters.items():
+            if param in arguments:
+                value = arguments[param]
+            elif "default" in spec:
+                value = spec["default"]
+            else:
+                raise ValueError(f"Missing required parameter for {self.name}: {param}")
+            accepted = PARAMETER_TYPES[spec["type"]][1]
+            # bool is an int subclass; only accept it where a boolean is declared
+            if value is not None and (not isinstance(value, accepted)
+                                      or (isinstance(value, bool) and spec["type"] != "boolean")):
+                raise ValueError(f"Parameter {param} of {self.name} must be of type {spec['type']}")
+            if "enum" in spec and value not in spec["enum"]:
+                raise ValueError(f"Parameter {param} of {self.name} must be one of {spec['enum']}")
+            values[param] = value
+        return values
+
+    def run(self, db, arguments: Dict[str, Any]) -> Any:
+        """Execute against the matching database object (PostgresDB or Neo4jDB)"""
+        values = self.bind(arguments)
+        if self.backend == "postgres":
+            return db.execute_prepared(self.statement_name, self.prepared_query, self.parameter_types,
+                                       [values[p] for p in self.order])
+        return db.read(self.query, values)
+
+
+class QueryCatalog:
+    """Named queries by tool name"""
+
+    def __init__(self, queries: Optional[List[NamedQuery]] = None):
+        self.queries: Dict[str, NamedQuery] = {}
+        for query in queries or []:
+            if query.name in self.queries:
+                raise ValueError(f"Duplicate query name: {query.name}")
+            self.queries[query.name] = query
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.queries
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+    def get(self, name: str) -> NamedQuery:
+        try:
+            return self.queries[name]
+        except KeyError:
+            raise ValueError(f"Unknown named query: {name}") from None
+
+    def tools(self) -> List[Dict[str, Any]]:
+        """Tool definitions (name, description, inputSchema) for every entry"""
+        return [
+            {"name": query.name, "description": query.description, "inputSchema": query.input_schema()}
+            for query in self.queries.values()
+        ]
+
+    @classmethod
+    def from_file(cls, path: str, reserved: tuple = ()) -> "QueryCatalog":
+        """Load a catalog file; names in reserved (built-in tools) are rejected"""
+        with open(path) as f:
+            config = json.load(f)
+        queries = []
+        for entry in config.get("queries", []):
+            if entry.get("name") in reserved:
+                raise ValueError(f"Query name {entry['name']} clashes with a built-in tool")
+            queries.append(NamedQuery(
+                name=entry.get("name"),
+                backend=entry.get("backend"),
+                query=entry.get("query", ""),
+                parameters=entry.get("parameters"),
+                description=entry.get("description", ""),
+            ))
+        return cls(queries)
+
+
+def load_catalog_from_env(reserved: tuple = RESERVED_TOOL_NAMES) -> QueryCatalog:
+    """Load QUERY_CATALOG_PATH, or an empty catalog when it is not set"""
+    if not QUERY_CATALOG_PATH:
+        return QueryCatalog()
+    catalog = QueryCatalog.from_file(QUERY_CATALOG_PATH, reserved)
+    logger.info(f"Loaded {len(catalog)} named queries from {QUERY_CATALOG_PATH}")
+    return catalog
+
+
+query_catalog = load_catalog_from_env()
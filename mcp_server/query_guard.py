@@ -0,0 +1,278 @@
+"""
+Query guard
+Admission control for ad-hoc queries from the query tools. Each query runs in
+a read-only transaction with a timeout, and is EXPLAINed first: queries whose
+estimated cost is over budget are rejected, and queries estimated to return
+too many rows are limited (or rejected).
+"""
+
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+QUERY_GUARD_ENABLED = os.getenv("QUERY_GUARD_ENABLED", "true").lower() == "true"
+# Postgres planner cost units (EXPLAIN "Total Cost")
+QUERY_GUARD_MAX_COST = float(os.getenv("QUERY_GUARD_MAX_COST", "1000000"))
+# Neo4j has no cost estimate; the sum of estimated rows over all plan operators is used instead
+QUERY_GUARD_NEO4J_MAX_COST = float(os.getenv("QUERY_GUARD_NEO4J_MAX_COST", "10000000"))
+QUERY_GUARD_MAX_ROWS = int(os.getenv("QUERY_GUARD_MAX_ROWS", "100000"))
+# "limit": add a LIMIT of QUERY_GUARD_MAX_ROWS; "reject": refuse the query
+QUERY_GUARD_ROW_ACTION = os.getenv("QUERY_GUARD_ROW_ACTION", "limit").lower()
+QUERY_STATEMENT_TIMEOUT_MS = int(os.getenv("QUERY_STATEMENT_TIMEOUT_MS", "30000"))
+NEO4J_TRANSACTION_TIMEOUT = float(os.getenv("NEO4J_TRANSACTION_TIMEOUT", "30"))
+
+logger = logging.getLogger("query_guard")
+
+# Matched against the query with leading comments removed
+_EXPLAINABLE = re.compile(r"^(select|with|values|table)\b", re.IGNORECASE)
+_CYPHER_LIMIT = re.compile(r"\blimit\s+\S+\s*;?\s*$", re.IGNORECASE)
+_DOLLAR_TAG = re.compile(r"\$([A-Za-z_][A-Za-z0-9_]*)?\$")
+
+
+class QueryRejected(ValueError):
+    """A query was refused by the guard"""
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch in "_$"
+
+
+def _comment_end(query: str, i: int) -> Optional[int]:
+    """Index just past the comment (-- or nested /* */) starting at i, or None if there is none"""
+    if query.startswith("--", i):
+        end = query.find("\n", i)
+        return len(query) if end < 0 else end + 1
+    if not query.startswith("/*", i):
+        return None
+    depth, i = 1, i + 2
+    while i < len(query) and depth:
+        if query.startswith("/*", i):
+            depth, i = depth + 1, i + 2
+        elif query.startswith("*/", i):
+            depth, i = depth - 1, i + 2
+        else:
+            i += 1
+    if depth:
+        raise QueryRejected("Query rejected: unterminated comment")
+    return i
+
+
+def _statement_start(query: str) -> str:
+    """The query without leading whitespace and comments, for matching its first keyword"""
+    i = 0
+    while i < len(query):
+        if query[i].isspace():
+            i += 1
+            continue
+        end = _comment_end(query, i)
+        if end is None:
+            break
+        i = end
+    return query[i:]
+
+
+def split_postgres_statements(query: str) -> List[str]:
+    """Split SQL into statements at top-level semicolons
+
+    Follows the Postgres lexer for the places a semicolon does not end a
+    statement: quoted strings ('...', E'...' with backslash escapes), quoted
+    identifiers, dollar-quoted strings and comments (-- and nested /* */).
+    Statements that are empty apart from whitespace and comments are dropped.
+    """
+    statements: List[str] = []
+    start = 0
+    has_content = False
+    i, n = 0, len(query)
+    while i < n:
+        ch = query[i]
+        end = _comment_end(query, i)
+        if end is not None:
+            i = end
+            continue
+        if ch == ";":
+            if has_content:
+                statements.append(query[start:i])
+            start, has_content = i + 1, False
+            i += 1
+            continue
+        if ch.isspace():
+            i += 1
+            continue
+        has_content = True
+        if ch in "'\"":
+            # E'...' strings take backslash escapes; doubled quotes escape in all quoted forms
+            escapes = ch == "'" and i > 0 and query[i - 1] in "eE" and (i < 2 or not _is_word_char(query[i - 2]))
+            i += 1
+            while True:
+                if i >= n:
+                    raise QueryRejected("Query rejected: unterminated quoted string")
+                if escapes and query[i] == "\\":
+                    i += 2
+                elif query[i] == ch:
+                    if query.startswith(ch * 2, i):
+                        i += 2
+                    else:
+                        i += 1
+                        break
+                else:
+                    i += 1
+            continue
+        if ch == "$" and (i == 0 or not _is_word_char(query[i - 1])):
+            tag = _DOLLAR_TAG.match(query, i)
+            if tag:
+                end = query.find(tag.group(0), tag.end())
+                if end < 0:
+                    raise QueryRejected("Query rejected: unterminated dollar-quoted string")
+                i = end + len(tag.group(0))
+                continue
+        i += 1
+    if has_content:
+        statements.append(query[start:])
+    return statements
+
+
+def _neo4j_plan_rows(plan: Dict[str, Any]):
+    """Return (estimated result rows, sum of estimated rows over all operators)"""
+    def args(node):
+        return node.get("args") or node.get("arguments") or {}
+
+    total = 0.0
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        total += float(args(node).get("EstimatedRows", 0))
+        stack.extend(node.get("children", []))
+    return float(args(plan).get("EstimatedRows", 0)), total
+
+
+class QueryGuard:
+    """Read-only transactions, timeouts and EXPLAIN-based admission for tool queries
+
+    Args:
+        max_cost: Postgres total cost above which a query is rejected
+        neo4j_max_cost: Neo4j summed operator rows above which a query is rejected
+        max_rows: Estimated result rows above which a query is limited or rejected
+        row_action: "limit" or "reject"
+        statement_timeout_ms: Postgres statement_timeout per call (0 disables)
+        neo4j_timeout: Neo4j transaction timeout in seconds (0 uses the server default)
+        enabled: When False, only the read-only transactions and timeouts apply
+    """
+
+    def __init__(self, max_cost: float = 1e6, neo4j_max_cost: float = 1e7, max_rows: int = 100000,
+                 row_action: str = "limit", statement_timeout_ms: int = 30000,
+                 neo4j_timeout: float = 30, enabled: bool = True):
+        if row_action not in ("limit", "reject"):
+            raise ValueError(f"Unknown query guard row action: {row_action}")
+        self.max_cost = {"postgres": max_cost, "neo4j": neo4j_max_cost}
+        self.max_rows = max_rows
+        self.row_action = row_action
+        self.statement_timeout_ms = statement_timeout_ms
+        self.neo4j_timeout = neo4j_timeout
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.rejected = 0
+        self.limited = 0
+
+    def single_statement(self, query: str) -> str:
+        """Return the query if it is exactly one SQL statement, else reject it
+
+        psycopg2 sends the whole string as one simple query, so a stacked
+        "SELECT 1; COMMIT; DELETE ..." would end the read-only transaction and
+        run the rest. Applies whether or not admission checks are enabled.
+        """
+        statements = split_postgres_statements(query)
+        if len(statements) != 1:
+            self._reject("postgres", "exactly one SQL statement is allowed" if statements else "empty query")
+        return statements[0].strip()
+
+    def prepare_postgres(self, cur, query: str, allow_limit: bool = True) -> str:
+        """Make the cursor's (new) transaction read-only with a timeout and return the query to run
+
+        Must be the first statement of the transaction. Queries with more than
+        one statement are rejected before anything is sent.
+        """
+        query = self.single_statement(query)
+        cur.execute("SET TRANSACTION READ ONLY")
+        if self.statement_timeout_ms > 0:
+            cur.execute("SET LOCAL statement_timeout = %s", (int(self.statement_timeout_ms),))
+        if not self.enabled or not _EXPLAINABLE.match(_statement_start(query)):
+            return query
+        cur.execute("EXPLAIN (FORMAT JSON) " + query)
+        plan = cur.fetchone()[0][0]["Plan"]
+        return self._admit("postgres", query, float(plan["Total Cost"]), float(plan["Plan Rows"]), allow_limit)
+
+    def prepare_neo4j(self, tx, query: str, parameters: Optional[Dict[str, Any]] = None,
+                      allow_limit: bool = True) -> str:
+        """EXPLAIN a Cypher query inside a read transaction and return the query to run"""
+        if not self.enabled:
+            return query
+        plan = tx.run("EXPLAIN " + query, parameters).consume().plan
+        if not plan:
+            return query
+        rows, cost = _neo4j_plan_rows(plan)
+        return self._admit("neo4j", query, cost, rows, allow_limit)
+
+    def _admit(self, backend: str, query: str, cost: float, rows: float, allow_limit: bool) -> str:
+        with self._lock:
+            self.checked += 1
+        if cost > self.max_cost[backend]:
+            self._reject(backend, f"estimated cost {cost:.0f} exceeds the budget of "
+                                  f"{self.max_cost[backend]:.0f}; narrow it with filters or join conditions")
+        if rows <= self.max_rows or not allow_limit:
+            # Paged reads are bounded per page; only the cost budget applies to them
+            return query
+        limited = self._limit(backend, query) if self.row_action == "limit" else None
+        if limited is None:
+            self._reject(backend, f"estimated {rows:.0f} rows exceeds the limit of {self.max_rows}; "
+                                  f"add a LIMIT or read it in pages with page_size")
+        with self._lock:
+            self.limited += 1
+        logger.warning(f"Limited {backend} query to {self.max_rows} rows (estimated {rows:.0f})")
+        return limited
+
+    def _limit(self, backend: str, query: str) -> Optional[str]:
+        """Wrap or extend the query with a LIMIT, or None if that is not possible"""
+        query = query.strip().rstrip(";")
+        if backend == "postgres":
+            # On its own line so a trailing -- comment in the query cannot swallow it
+            return f"SELECT * FROM (\n{query}\n) AS guarded_query LIMIT {self.max_rows}"
+        if _CYPHER_LIMIT.search(query):
+            return None
+        return f"{query} LIMIT {self.max_rows}"
+
+    def _reject(self, backend: str, reason: str) -> None:
+        with self._lock:
+            self.rejected += 1
+        raise QueryRejected(f"Query rejected: {reason}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return admission counters"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "max_cost": dict(self.max_cost),
+                "max_rows": self.max_rows,
+                "row_action": self.row_action,
+                "statement_timeout_ms": self.statement_timeout_ms,
+                "neo4j_timeout": self.neo4j_timeout,
+                "checked": self.checked,
+                "rejected": self.rejected,
+                "limited": self.limited,
+            }
+
+
+query_guard = QueryGuard(
+    max_cost=QUERY_GUARD_MAX_COST,
+    neo4j_max_cost=QUERY_GUARD_NEO4J_MAX_COST,
+    max_rows=QUERY_GUARD_MAX_ROWS,
+    row_action=QUERY_GUARD_ROW_ACTION,
+    statement_timeout_ms=QUERY_STATEMENT_TIMEOUT_MS,
+    neo4j_timeout=NEO4J_TRANSACTION_TIMEOUT,
+    enabled=QUERY_GUARD_ENABLED,
+)
@@ -0,0 +1,182 @@
+"""
+Query plan summaries
+Condenses Postgres EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) output and Neo4j
+PROFILE/EXPLAIN plans into the few most expensive operators plus hints an
+agent can act on (missing indexes, bad estimates, spills, cartesian products)
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+# Thresholds for hints
+_FILTER_DISCARD_ROWS = 1000
+_MISESTIMATE_FACTOR = 100
+_NESTED_LOOP_ROWS = 100000
+
+_NEO4J_LABEL = re.compile(r":`?(\w+)`?")
+_NEO4J_PROPERTY = re.compile(r"\b\w+\.`?(\w+)`?")
+# "*]", "*..]" or "*2..]": a variable-length relationship with no upper bound
+_NEO4J_UNBOUNDED = re.compile(r"\*(\s*\d*\s*\.\.)?\s*\]")
+
+
+def _compact(values: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in values.items() if value not in (None, "", [])}
+
+
+def condense_postgres_plan(explain: Dict[str, Any], analyzed: bool, top: int = 5) -> Dict[str, Any]:
+    """Summarize one EXPLAIN (FORMAT JSON) document
+
+    Operators are ranked by their own (exclusive) time when analyzed, else by their own cost.
+    """
+    nodes: List[Dict[str, Any]] = []
+    hints: List[str] = []
+
+    def total_time(node):
+        return node.get("Actual Total Time", 0.0) * (node.get("Actual Loops", 1) or 1)
+
+    def walk(node, depth):
+        children = node.get("Plans", [])
+        loops = node.get("Actual Loops", 1) or 1
+        if analyzed:
+            own = max(total_time(node) - sum(total_time(c) for c in children), 0.0)
+        else:
+            own = max(node.get("Total Cost", 0.0) - sum(c.get("Total Cost", 0.0) for c in children), 0.0)
+        condition = next((node[key] for key in ("Filter", "Index Cond", "Hash Cond", "Merge Cond", "Join Filter",
+                                                 "Recheck Cond") if key in node), None)
+        actual_rows = node["Actual Rows"] * loops if "Actual Rows" in node else None
+        nodes.append(_compact({
+            "node": node.get("Node Type"),
+            "relation": node.get("Relation Name"),
+            "index": node.get("Index Name"),
+            "depth": depth,
+            "self_time_ms" if analyzed else "self_cost": round(own, 3),
+            "rows_estimated": node.get("Plan Rows"),
+            "rows_actual": actual_rows,
+            "loops": loops if loops > 1 else None,
+            "condition": condition,
+            "rows_removed_by_filter": node.get("Rows Removed by Filter"),
+            "shared_hit_blocks": node.get("Shared Hit Blocks"),
+            "shared_read_blocks": node.get("Shared Read Blocks"),
+        }))
+        _postgres_hints(node, children, actual_rows, hints)
+        for child in children:
+            walk(child, depth + 1)
+
+    plan = explain["Plan"]
+    walk(plan, 0)
+    metric = "self_time_ms" if analyzed else "self_cost"
+    return _compact({
+        "backend": "postgres",
+        "analyzed": analyzed,
+        "total_cost": plan.get("Total Cost"),
+        "planning_time_ms": explain.get("Planning Time"),
+        "execution_time_ms": explain.get("Execution Time"),
+        "operators": len(nodes),
+        "top_nodes": sorted(nodes, key=lambda n: n.get(metric, 0), reverse=True)[:top],
+        "hints": list(dict.fromkeys(hints)),
+    })
+
+
+def _postgres_hints(node: Dict[str, Any], children: List[Dict[str, Any]], actual_rows: Optional[float],
+                    hints: List[str]) -> None:
+    node_type = node.get("Node Type", "")
+    relation = node.get("Relation Name")
+    removed = (node.get("Rows Removed by Filter") or 0) * (node.get("Actual Loops", 1) or 1)
+    if node_type == "Seq Scan" and "Filter" in node and removed >= _FILTER_DISCARD_ROWS \
+            and removed > 10 * (actual_rows or 0):
+        hints.append(f"Seq Scan on {relation} discards {removed} rows with filter {node['Filter']}; "
+                     f"an index on the filtered column(s) may help")
+    if actual_rows is not None and node.get("Plan Rows") is not None:
+        estimated = node["Plan Rows"] * (node.get("Actual Loops", 1) or 1)
+        high, low = max(actual_rows, estimated), max(min(actual_rows, estimated), 1)
+        if high / low >= _MISESTIMATE_FACTOR:
+            target = f"ANALYZE {relation}" if relation else "ANALYZE on the tables involved"
+            hints.append(f"{node_type} estimated {estimated:.0f} rows but produced {actual_rows:.0f}; "
+                         f"statistics may be stale, run {target}")
+    if node.get("Sort Space Type") == "Disk":
+        hints.append(f"Sort spilled {node.get('Sort Space Used')} kB to disk; raise work_mem or sort fewer rows")
+    if (node.get("Hash Batches") or 1) > 1:
+        hints.append(f"Hash spilled into {node['Hash Batches']} batches; raise work_mem or hash fewer rows")
+    if node_type == "Nested Loop":
+        for child in children:
+            if child.get("Node Type") == "Seq Scan" and (child.get("Actual Loops", 1) or 1) > 1 \
+                    and (child.get("Actual Loops", 1) or 1) * (child.get("Plan Rows") or 0) >= _NESTED_LOOP_ROWS:
+                hints.append(f"Nested Loop rescans {child.get('Relation Name')} {child['Actual Loops']} times; "
+                             f"an index on the join key may help")
+        if "Join Filter" not in node and not any("Cond" in key for child in children for key in child) \
+                and node.get("Plan Rows", 0) >= _NESTED_LOOP_ROWS:
+            hints.append("Nested Loop without a join condition (cross join); add a join predicate")
+
+
+def _neo4j_value(node: Dict[str, Any], *keys: str) -> Any:
+    args = node.get("args") or node.get("arguments") or {}
+    for key in keys:
+        if key in node:
+            return node[key]
+        if key in args:
+            return args[key]
+    return None
+
+
+def condense_neo4j_plan(plan: Dict[str, Any], analyzed: bool, top: int = 5) -> Dict[str, Any]:
+    """Summarize a Neo4j PROFILE (analyzed) or EXPLAIN plan
+
+    Operators are ranked by database hits when profiled, else by estimated rows.
+    """
+    nodes: List[Dict[str, Any]] = []
+    hints: List[str] = []
+
+    def walk(node, depth, parent):
+        operator = (node.get("operatorType") or "").split("@")[0]
+        details = _neo4j_value(node, "Details") or ""
+        nodes.append(_compact({
+            "operator": operator,
+            "details": details,
+            "depth": depth,
+            "rows_estimated": round(_neo4j_value(node, "EstimatedRows") or 0, 1),
+            "rows": _neo4j_value(node, "rows", "Rows"),
+            "db_hits": _neo4j_value(node, "dbHits", "DbHits"),
+            "page_cache_hits": _neo4j_value(node, "pageCacheHits", "PageCacheHits"),
+            "page_cache_misses": _neo4j_value(node, "pageCacheMisses", "PageCacheMisses"),
+        }))
+        _neo4j_hints(operator, details, parent, hints)
+        for child in node.get("children", []):
+            walk(child, depth + 1, (operator, details))
+
+    walk(plan, 0, None)
+    metric = "db_hits" if analyzed else "rows_estimated"
+    return _compact({
+        "backend": "neo4j",
+        "analyzed": analyzed,
+        "total_db_hits": sum(n.get("db_hits", 0) for n in nodes) if analyzed else None,
+        "operators": len(nodes),
+        "top_nodes": sorted(nodes, key=lambda n: n.get(metric, 0), reverse=True)[:top],
+        "hints": list(dict.fromkeys(hints)),
+    })
+
+
+def _neo4j_hints(operator: str, details: str, parent: Optional[tuple], hints: List[str]) -> None:
+    if operator == "AllNodesScan":
+        hints.append(f"AllNodesScan ({details}) reads every node; add a label to the pattern")
+    elif operator == "NodeByLabelScan" and parent and parent[0] == "Filter":
+        label = _NEO4J_LABEL.search(details)
+        prop = _NEO4J_PROPERTY.search(parent[1])
+        if label and prop:
+            hints.append(f"Label scan of :{label.group(1)} filtered on {prop.group(1)}; "
+                         f"CREATE INDEX FOR (n:{label.group(1)}) ON (n.{prop.group(1)})")
+        else:
+            hints.append(f"Label scan followed by a filter ({parent[1]}); an index on the filtered property may help")
+    elif operator == "CartesianProduct":
+        hints.append("CartesianProduct: the patterns are not connected; join them or add a predicate")
+    elif operator == "Eager":
+        hints.append("Eager operator buffers the whole intermediate result; split reads and writes")
+    if operator.startswith("VarLengthExpand") and _NEO4J_UNBOUNDED.search(details):
+        hints.append(f"Variable-length expansion without an upper bound ({details}); add one, e.g. *1..3")
+
+
+def explain_query(db, backend: str, query: str, analyze: bool = True, top: int = 5) -> Dict[str, Any]:
+    """Plan (and by default run) a query on a PostgresDB or Neo4jDB and return the condensed plan"""
+    plan, analyzed = db.explain(query, analyze)
+    if backend == "postgres":
+        return condense_postgres_plan(plan, analyzed, top)
+    return condense_neo4j_plan(plan or {}, analyzed, top)
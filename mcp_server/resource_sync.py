@@ -0,0 +1,259 @@
+"""
+Resource sync
+Since-cursors and ETags for resource listings. Each backend exposes a
+monotonic head (the highest prompt id); clients pass back the cursor from the
+previous response and only receive rows above it. A listing whose cursor and
+heads have not moved has the same ETag, so pollers get a 304 without any rows
+being read.
+
+Cursor format: "postgres:<id>,neo4j:<id>" (missing backends start at 0).
+Neo4j node ids can be reused after deletes, so the Neo4j cursor assumes
+Prompt nodes are only ever added.
+
+The MCP server exposes the stored prompts (users rows and Person nodes) as
+resources with the same cursors, and notifies subscribed sessions when a
+write path touches them.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RESOURCE_PAGE_SIZE = int(os.getenv("RESOURCE_PAGE_SIZE", "100"))
+# Writes within this window are coalesced into one notification per resource
+RESOURCE_NOTIFY_INTERVAL_MS = float(os.getenv("RESOURCE_NOTIFY_INTERVAL_MS", "100"))
+
+logger = logging.getLogger("resource_sync")
+
+RESOURCE_BACKENDS = ("postgres", "neo4j")
+# Rows between a cursor and the head just probed, in id order; since, until and limit are validated
+# integers. Bounding by the head makes each cached page a fixed range of rows.
+RESOURCE_QUERIES = {
+    "postgres": "SELECT * FROM prompts WHERE id > {since} AND id <= {until} ORDER BY id LIMIT {limit}",
+    "neo4j": "MATCH (n:Prompt) WHERE id(n) > {since} AND id(n) <= {until} "
+             "RETURN n, id(n) AS id ORDER BY id LIMIT {limit}",
+}
+# Cheap "has anything changed" probes (a primary key lookup / label scan); always read uncached
+RESOURCE_HEAD_QUERIES = {
+    "postgres": "SELECT max(id) AS head FROM prompts",
+    "neo4j": "MATCH (n:Prompt) RETURN max(id(n)) AS head",
+}
+
+
+def parse_since(since: Optional[str]) -> Dict[str, int]:
+    """Parse a cursor string into backend -> last seen id"""
+    cursor = {backend: 0 for backend in RESOURCE_BACKENDS}
+    if not since:
+        return cursor
+    for part in since.split(","):
+        backend, sep, value = part.strip().partition(":")
+        if not sep or backend not in cursor:
+            raise ValueError(f"Invalid since cursor: {since!r}")
+        try:
+            cursor[backend] = max(int(value), 0)
+        except ValueError:
+            raise ValueError(f"Invalid since cursor: {since!r}") from None
+    return cursor
+
+
+def format_since(cursor: Dict[str, int]) -> str:
+    return ",".join(f"{backend}:{cursor[backend]}" for backend in RESOURCE_BACKENDS)
+
+
+# Stored prompts, as written by classify_and_store and bulk_ingest (MCP resources)
+PROMPT_RESOURCE_URIS = {
+    "postgres": "postgres://users",
+    "neo4j": "neo4j://Person",
+}
+# Bounded by an uncached head, like RESOURCE_QUERIES
+PROMPT_RESOURCE_QUERIES = {
+    "postgres": "SELECT id, name FROM users WHERE id > {since} AND id <= {until} ORDER BY id LIMIT {limit}",
+    "neo4j": "MATCH (p:Person) WHERE id(p) > {since} AND id(p) <= {until} "
+             "RETURN id(p) AS id, p.name AS name ORDER BY id LIMIT {limit}",
+}
+PROMPT_RESOURCE_HEAD_QUERIES = {
+    "postgres": "SELECT max(id) AS head FROM users",
+    "neo4j": "MATCH (p:Person) RETURN max(id(p)) AS head",
+}
+PROMPT_RESOURCE_ITEM_QUERIES = {
+    "postgres": "SELECT id, name FROM users WHERE id = {id}",
+    "neo4j": "MATCH (p:Person) WHERE id(p) = {id} RETURN id(p) AS id, p.name AS name",
+}
+
+
+def rows_query(backend: str, since: int, limit: int = RESOURCE_PAGE_SIZE,
+               queries: Dict[str, str] = RESOURCE_QUERIES, until: Optional[int] = None) -> str:
+    return queries[backend].format(since=int(since), limit=int(limit),
+                                   until=None if until is None else int(until))
+
+
+def parse_resource_uri(uri: str) -> Tuple[str, Optional[int], int]:
+    """Split a prompt resource URI into (backend, item id or None, since)
+
+    "postgres://users" is the collection, "postgres://users/42" one row and
+    "postgres://users?since=42" the rows added after id 42.
+    """
+    parts = urlsplit(str(uri))
+    backend = parts.scheme
+    if PROMPT_RESOURCE_URIS.get(backend) != f"{parts.scheme}://{parts.netloc}":
+        raise ValueError(f"Unknown resource: {uri}")
+    try:
+        item = parts.path.strip("/")
+        item_id = int(item) if item else None
+        since = int(parse_qs(parts.query).get("since", ["0"])[0])
+    except ValueError:
+        raise ValueError(f"Invalid resource URI: {uri}") from None
+    return backend, item_id, max(since, 0)
+
+
+def _id_column(rows: List[Any], name: str) -> Any:
+    columns = getattr(rows, "columns", None) or []
+    return columns.index(name) if name in columns else 0
+
+
+def head_value(rows: List[Any]) -> int:
+    """The head id from a head query result (0 for an empty table)"""
+    if not rows:
+        return 0
+    row = rows[0]
+    value = row.get("head") if isinstance(row, dict) else row[_id_column(rows, "head")]
+    return int(value or 0)
+
+
+def last_id(rows: List[Any], default: int) -> int:
+    """The id of the last row of a rows_query result, or default when it is empty"""
+    if not rows:
+        return default
+    row = rows[-1]
+    return int(row["id"] if isinstance(row, dict) else row[_id_column(rows, "id")])
+
+
+def compute_etag(cursor: Dict[str, int], heads: Dict[str, int], limit: int = RESOURCE_PAGE_SIZE) -> str:
+    """Weak ETag for a listing: identical while neither the cursor nor any head moves"""
+    state = json.dumps({"since": cursor, "heads": heads, "limit": limit}, sort_keys=True)
+    return f'W/"{hashlib.sha1(state.encode()).hexdigest()[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison: W/"x" and "x" match
+    opaque = lambda tag: tag[2:] if tag.startswith("W/") else tag
+    return "*" in tags or opaque(etag) in [opaque(tag) for tag in tags]
+
+
+class ResourceNotifier:
+    """Tracks resource subscriptions per session and sends coalesced change notifications
+
+    Sessions that subscribed to a collection URI get notifications/resources/updated
+    for it; sessions that listed resources get notifications/resources/list_changed.
+    changed() may be called from any thread (write-behind and executor threads
+    included); notifications are sent on the event loop passed to attach().
+
+    Args:
+        interval_ms: Writes within this window produce one notification per resource
+    """
+
+    def __init__(self, interval_ms: float = 100):
+        self.interval = interval_ms / 1000.0
+        self._subscriptions: Dict[str, "weakref.WeakSet"] = {}
+        self._listeners: "weakref.WeakSet" = weakref.WeakSet()
+        self._pending: set = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self.changes = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.failed = 0
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def subscribe(self, uri: str, session) -> None:
+        with self._lock:
+            self._subscriptions.setdefault(str(uri), weakref.WeakSet()).add(session)
+
+    def unsubscribe(self, uri: str, session) -> None:
+        with self._lock:
+            sessions = self._subscriptions.get(str(uri))
+            if sessions is not None:
+                sessions.discard(session)
+
+    def listen(self, session) -> None:
+        """Send list_changed notifications to a session that has listed resources"""
+        with self._lock:
+            self._listeners.add(session)
+
+    def changed(self, backend: str) -> None:
+        """Record a write to a backend's prompt resources"""
+        uri = PROMPT_RESOURCE_URIS[backend]
+        with self._lock:
+            self.changes += 1
+            if not self._listeners and not self._subscriptions.get(uri):
+                return
+            if backend in self._pending:
+                self.coalesced += 1
+                return
+            self._pending.add(backend)
+            loop = self._loop
+        try:
+            if loop is None:
+                raise RuntimeError("no event loop attached")
+            loop.call_soon_threadsafe(loop.call_later, self.interval, self._schedule_flush)
+        except RuntimeError:
+            # Not serving (or shutting down): nobody to notify
+            with self._lock:
+                self._pending.discard(backend)
+
+    def _schedule_flush(self) -> None:
+        asyncio.ensure_future(self._flush())
+
+    async def _flush(self) -> None:
+        with self._lock:
+            backends, self._pending = self._pending, set()
+            targets = [(PROMPT_RESOURCE_URIS[backend], list(self._subscriptions.get(PROMPT_RESOURCE_URIS[backend], ())))
+                       for backend in backends]
+            listeners = list(self._listeners) if backends else []
+        for uri, sessions in targets:
+            for session in sessions:
+                await self._send(session, session.send_resource_updated, uri)
+        for session in listeners:
+            await self._send(session, session.send_resource_list_changed)
+
+    async def _send(self, session, send, *args) -> None:
+        try:
+            await send(*args)
+            self.sent += 1
+        except Exception as e:
+            # The session is gone; stop notifying it
+            self.failed += 1
+            logger.debug(f"Dropping resource subscriber after failed notification: {e}")
+            with self._lock:
+                self._listeners.discard(session)
+                for sessions in self._subscriptions.values():
+                    sessions.discard(session)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return subscription and notification counters"""
+        with self._lock:
+            return {
+                "subscriptions": {uri: len(sessions) for uri, sessions in self._subscriptions.items() if sessions},
+                "listeners": len(self._listeners),
+                "changes": self.changes,
+                "coalesced": self.coalesced,
+                "notifications_sent": self.sent,
+                "notifications_failed": self.failed,
+            }
+
+
+resource_notifier = ResourceNotifier(interval_ms=RESOURCE_NOTIFY_INTERVAL_MS)
@@ -0,0 +1,125 @@
+"""
+Result encodings
+Serializes query results for tool responses. 'text' keeps each front end's
+existing output; the other formats carry column names and drop whitespace:
+
+    json      {"columns": [...], "rows": [[...], ...]}
+    columnar  {"column": [values...], ...}
+    csv       header line plus one line per row
+    arrow     Arrow IPC stream, base64 (requires pyarrow)
+    parquet   Parquet file, base64 (requires pyarrow)
+"""
+
+import base64
+import csv
+import io
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+RESULT_FORMATS = ("text", "json", "columnar", "csv", "arrow", "parquet")
+# Binary formats and the MIME type they are attached with
+BINARY_FORMATS = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class QueryRows(list):
+    """Query rows that remember their column names (a plain list otherwise)"""
+
+    def __init__(self, rows: Iterable[Any] = (), columns: Optional[List[str]] = None):
+        super().__init__(rows)
+        self.columns = columns
+
+
+def dumps_compact(obj: Any) -> str:
+    """Compact JSON, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def check_format(fmt: Optional[str]) -> str:
+    """Validate a requested format (None means 'text')"""
+    fmt = (fmt or "text").lower()
+    if fmt not in RESULT_FORMATS:
+        raise ValueError(f"Unsupported format: {fmt} (choose from {', '.join(RESULT_FORMATS)})")
+    return fmt
+
+
+def _table(rows: List[Any], columns: Optional[List[str]]):
+    """Return (columns, rows as lists) for tuple or dict rows"""
+    if columns is None:
+        columns = getattr(rows, "columns", None)
+    if columns is None and rows and isinstance(rows[0], dict):
+        columns = list(rows[0])
+    if columns is None:
+        columns = [f"column{i + 1}" for i in range(len(rows[0]))] if rows else []
+    values = [[row.get(c) for c in columns] if isinstance(row, dict) else list(row) for row in rows]
+    return columns, values
+
+
+def _arrow_table(columns: List[str], values: List[List[Any]]):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ValueError("Install pyarrow to use the arrow and parquet formats") from None
+    arrays = []
+    for i in range(len(columns)):
+        column = [row[i] for row in values]
+        try:
+            arrays.append(pa.array(column))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            # Mixed or unsupported types (maps, nodes, mixed numerics): store this column as strings
+            arrays.append(pa.array([None if v is None else str(v) for v in column], type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=columns)
+
+
+def _json_object(columns: List[str], values: List[List[Any]], fmt: str) -> Dict[str, Any]:
+    if fmt == "json":
+        return {"columns": columns, "rows": values}
+    return {column: [row[i] for row in values] for i, column in enumerate(columns)}
+
+
+def encode_rows(rows: List[Any], fmt: str, columns: Optional[List[str]] = None) -> str:
+    """Encode rows in a non-text format; binary formats are returned base64-encoded"""
+    columns, values = _table(rows, columns)
+    if fmt in ("json", "columnar"):
+        return dumps_compact(_json_object(columns, values, fmt))
+    if fmt == "csv":
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(columns)
+        writer.writerows(values)
+        return out.getvalue()
+    if fmt in BINARY_FORMATS:
+        table = _arrow_table(columns, values)
+        import pyarrow as pa
+        sink = io.BytesIO()
+        if fmt == "arrow":
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+        else:
+            import pyarrow.parquet as pq
+            pq.write_table(table, sink)
+        return base64.b64encode(sink.getvalue()).decode("ascii")
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def encode_page(page: Dict[str, Any], fmt: str) -> str:
+    """Encode a paged result as compact JSON, keeping the paging fields alongside the rows
+
+    JSON formats are embedded as objects; csv, arrow and parquet as strings.
+    """
+    encoded = {key: value for key, value in page.items() if key not in ("rows", "columns")}
+    encoded["format"] = fmt
+    if fmt in ("json", "columnar"):
+        encoded["data"] = _json_object(*_table(page["rows"], page.get("columns")), fmt)
+    else:
+        encoded["data"] = encode_rows(page["rows"], fmt, page.get("columns"))
+    return dumps_compact(encoded)
@@ -0,0 +1,209 @@
+"""
+Result paging
+Open query results that are read one bounded page at a time and resumed later
+through an opaque continuation token
+"""
+
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+QUERY_PAGE_SIZE = int(os.getenv("QUERY_PAGE_SIZE", "500"))
+QUERY_MAX_PAGE_ROWS = int(os.getenv("QUERY_MAX_PAGE_ROWS", "10000"))
+QUERY_MAX_PAGE_BYTES = int(os.getenv("QUERY_MAX_PAGE_BYTES", str(1024 * 1024)))
+QUERY_CURSOR_IDLE_TIMEOUT = float(os.getenv("QUERY_CURSOR_IDLE_TIMEOUT", "300"))
+QUERY_MAX_OPEN_CURSORS = int(os.getenv("QUERY_MAX_OPEN_CURSORS", "4"))
+
+logger = logging.getLogger("result_paging")
+
+
+def clamp_page_size(page_size: Optional[int]) -> int:
+    """Apply the default page size and the hard per-page row cap"""
+    return max(1, min(int(page_size or QUERY_PAGE_SIZE), QUERY_MAX_PAGE_ROWS))
+
+
+class ResultHandle:
+    """An open result read incrementally in pages
+
+    Args:
+        fetch: Returns up to n more rows (an empty list once the result is exhausted)
+        close: Releases the underlying cursor/session/connection
+        describe: Returns the column names (may only be known after the first fetch)
+    """
+
+    def __init__(self, fetch: Callable[[int], List[Any]], close: Callable[[], None],
+                 describe: Callable[[], Optional[List[str]]] = lambda: None):
+        self._fetch = fetch
+        self._close = close
+        self._describe = describe
+        self._pending: deque = deque()
+        self._exhausted = False
+        self._closed = False
+        self.rows_returned = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def columns(self) -> Optional[List[str]]:
+        return self._describe()
+
+    def _fill(self, n: int) -> bool:
+        if not self._pending and not self._exhausted:
+            batch = self._fetch(n)
+            if batch:
+                self._pending.extend(batch)
+            else:
+                self._exhausted = True
+        return bool(self._pending)
+
+    def next_page(self, page_size: int, max_bytes: int = QUERY_MAX_PAGE_BYTES) -> Tuple[List[Any], Optional[str]]:
+        """Return (rows, truncated_by) where truncated_by is 'bytes' if the byte budget cut the page short
+
+        At least one row is returned per page so that paging always makes progress.
+        """
+        rows: List[Any] = []
+        size = 0
+        truncated_by = None
+        while len(rows) < page_size and self._fill(page_size - len(rows)):
+            row_bytes = len(json.dumps(self._pending[0], default=str))
+            if rows and size + row_bytes > max_bytes:
+                truncated_by = "bytes"
+                break
+            rows.append(self._pending.popleft())
+            size += row_bytes
+        self.rows_returned += len(rows)
+        self.last_used = time.monotonic()
+        return rows, truncated_by
+
+    def next_rows(self, n: int) -> List[Any]:
+        """Return up to n more rows without the byte budget (for consumers inside the server)"""
+        rows: List[Any] = []
+        while len(rows) < n and self._fill(n - len(rows)):
+            rows.append(self._pending.popleft())
+        self.rows_returned += len(rows)
+        self.last_used = time.monotonic()
+        return rows
+
+    def has_more(self) -> bool:
+        return self._fill(1)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._close()
+        except Exception as e:
+            logger.warning(f"Error closing result handle: {e}")
+
+
+class CursorRegistry:
+    """Keeps open result handles between calls, keyed by continuation token
+
+    Idle handles are closed after idle_timeout seconds; when max_open is reached
+    the least recently used handle is closed to make room.
+    """
+
+    def __init__(self, idle_timeout: float = QUERY_CURSOR_IDLE_TIMEOUT, max_open: int = QUERY_MAX_OPEN_CURSORS):
+        self.idle_timeout = idle_timeout
+        self.max_open = max(1, max_open)
+        self._handles: Dict[str, ResultHandle] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self.opened = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def register(self, handle: ResultHandle, token: Optional[str] = None) -> str:
+        """Park a handle until its continuation token is used"""
+        evicted = []
+        with self._lock:
+            if token is None:
+                token = secrets.token_urlsafe(16)
+                self.opened += 1
+            while len(self._handles) >= self.max_open:
+                oldest = min(self._handles, key=lambda t: self._handles[t].last_used)
+                evicted.append(self._handles.pop(oldest))
+                self.evicted += 1
+            handle.last_used = time.monotonic()
+            self._handles[token] = handle
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, name="cursor-reaper", daemon=True)
+                self._reaper.start()
+        for old in evicted:
+            old.close()
+        return token
+
+    def take(self, token: str) -> ResultHandle:
+        """Remove and return the handle for a token (it is re-registered if rows remain)"""
+        with self._lock:
+            handle = self._handles.pop(token, None)
+        if handle is None:
+            raise ValueError("Unknown or expired continuation token")
+        return handle
+
+    def _reap(self) -> None:
+        while True:
+            time.sleep(max(1.0, self.idle_timeout / 4))
+            cutoff = time.monotonic() - self.idle_timeout
+            with self._lock:
+                stale = [token for token, handle in self._handles.items() if handle.last_used < cutoff]
+                handles = [self._handles.pop(token) for token in stale]
+                self.expired += len(handles)
+            for handle in handles:
+                handle.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+        for handle in handles:
+            handle.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            open_handles = len(self._handles)
+        return {
+            "open": open_handles,
+            "max_open": self.max_open,
+            "idle_timeout": self.idle_timeout,
+            "opened": self.opened,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+
+def read_page(registry: CursorRegistry, open_handle: Callable[[], ResultHandle],
+              token: Optional[str] = None, page_size: Optional[int] = None) -> Dict[str, Any]:
+    """Read one page from a new result (open_handle) or a parked one (token)
+
+    Returns:
+        dict: columns, rows, row_count, next_token (None when exhausted) and truncated_by
+    """
+    handle = registry.take(token) if token else open_handle()
+    try:
+        rows, truncated_by = handle.next_page(clamp_page_size(page_size))
+        more = handle.has_more()
+        columns = handle.columns
+    except BaseException:
+        handle.close()
+        raise
+    if more:
+        token = registry.register(handle, token)
+    else:
+        handle.close()
+        token = None
+    return {
+        "columns": columns,
+        "rows": rows,
+        "row_count": len(rows),
+        "next_token": token,
+        "truncated_by": truncated_by,
+    }
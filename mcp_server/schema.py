@@ -0,0 +1,113 @@
+"""
+Schema bootstrap and migrations
+Creates tables, indexes and constraints once at startup (with versioning) so
+that no DDL runs on the write path
+
+Apply pending migrations on both databases and print the resulting versions with:
+    python -m mcp_server.schema
+"""
+
+import logging
+import sys
+from typing import List, Tuple
+
+logger = logging.getLogger("schema")
+
+# (version, description, statements) - append new migrations, never edit applied ones
+POSTGRES_MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "Create users and prompts tables", [
+        "CREATE TABLE IF NOT EXISTS users (id SERIAL PRIMARY KEY, name TEXT)",
+        "CREATE TABLE IF NOT EXISTS prompts ("
+        "id SERIAL PRIMARY KEY, prompt TEXT NOT NULL, db_used TEXT, "
+        "created_at TIMESTAMPTZ NOT NULL DEFAULT now())",
+    ]),
+    (2, "Index users.name", [
+        "CREATE INDEX IF NOT EXISTS users_name_idx ON users (name)",
+    ]),
+]
+
+NEO4J_MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "Unique Person.name (backs MERGE lookups with an index)", [
+        "CREATE CONSTRAINT person_name_unique IF NOT EXISTS FOR (p:Person) REQUIRE p.name IS UNIQUE",
+    ]),
+]
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent server processes migrate one at a time
+_POSTGRES_LOCK_KEY = 0x4D4350
+
+
+def migrate_postgres(conn) -> int:
+    """Apply pending Postgres migrations and return the schema version"""
+    with conn.cursor() as cur:
+        cur.execute(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, description TEXT NOT NULL, "
+            "applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+        )
+        conn.commit()
+
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (_POSTGRES_LOCK_KEY,))
+        cur.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cur.fetchall()}
+        for version, description, statements in POSTGRES_MIGRATIONS:
+            if version in applied:
+                continue
+            logger.info(f"Applying Postgres migration {version}: {description}")
+            for statement in statements:
+                cur.execute(statement)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (version, description)
+            )
+            applied.add(version)
+        conn.commit()
+    return max(applied, default=0)
+
+
+def migrate_neo4j(driver) -> int:
+    """Apply pending Neo4j migrations and return the schema version"""
+    with driver.session() as session:
+        applied = {
+            record["version"]
+            for record in session.run("MATCH (m:SchemaMigration) RETURN m.version AS version")
+        }
+        for version, description, statements in NEO4J_MIGRATIONS:
+            if version in applied:
+                continue
+            logger.info(f"Applying Neo4j migration {version}: {description}")
+            for statement in statements:
+                session.run(statement).consume()
+            session.run(
+                "MERGE (m:SchemaMigration {version: $version}) "
+                "SET m.description = $description, m.applied_at = datetime()",
+                version=version, description=description
+            ).consume()
+            applied.add(version)
+    return max(applied, default=0)
+
+
+def main() -> int:
+    """Apply pending migrations on both databases and print the resulting versions"""
+    from .postgres_db import PostgresDB
+    from .neo4j_db import Neo4jDB
+
+    logging.basicConfig(level=logging.INFO)
+    pg = PostgresDB()
+    pg.connect()
+    neo4j = Neo4jDB()
+    try:
+        neo4j.connect()
+    except BaseException:
+        pg.close()
+        raise
+    try:
+        print(f"Postgres schema version: {pg.schema_version}")
+        print(f"Neo4j schema version: {neo4j.schema_version}")
+    finally:
+        pg.close()
+        neo4j.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
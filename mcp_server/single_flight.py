@@ -0,0 +1,104 @@
+"""
+Single-flight request coalescing
+Concurrent callers asking for the same key share one in-flight execution
+instead of each triggering their own (e.g. duplicate Azure OpenAI calls)
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _LeaderCancelled(Exception):
+    """The caller running a shared call was cancelled; its waiters retry instead"""
+
+
+class SingleFlight:
+    """Deduplicates concurrent work by key for both threads and asyncio tasks
+
+    `do` serves threaded callers (FastAPI sync endpoints), `do_async` serves
+    coroutines (the stdio MCP server). The first caller for a key runs the
+    function; callers arriving while it is in flight wait for its result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._async_calls: Dict[str, asyncio.Future] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) unless a call for key is already running, then wait for that one"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def do_async(self, key: str, fn: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """Await fn(*args) unless a call for key is already in flight, then await that one
+
+        If the caller running the call is cancelled, only that caller sees the
+        cancellation: one of the waiters takes over the call and the rest wait for it.
+        """
+        joined = False
+        while True:
+            future = self._async_calls.get(key)
+            if future is None:
+                break
+            if not joined:
+                self.coalesced += 1
+                joined = True
+            try:
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                continue
+
+        future = self._async_calls[key] = asyncio.get_running_loop().create_future()
+        self.executions += 1
+        try:
+            result = await fn(*args)
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._async_calls[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many calls ran vs were coalesced onto an in-flight call"""
+        return {
+            "in_flight": len(self._calls) + len(self._async_calls),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
+
+
+classification_flight = SingleFlight()
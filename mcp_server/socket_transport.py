@@ -0,0 +1,159 @@
+"""
+Socket transport
+Serves MCP sessions over TCP or a Unix socket so one long-lived server process
+(with warm database pools, caches and Azure client) handles every editor
+session, instead of a new `docker exec` process per session. Framing is the
+same as stdio: one JSON-RPC message per line, so a client-side bridge only has
+to copy bytes between its stdio and the socket.
+"""
+
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+import anyio
+import anyio.lowlevel
+from anyio.streams.buffered import BufferedByteReceiveStream
+from dotenv import load_dotenv
+import mcp.types as types
+from mcp.shared.message import SessionMessage
+
+load_dotenv()
+
+MCP_TRANSPORTS = ("stdio", "tcp", "unix")
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio").lower()
+MCP_HOST = os.getenv("MCP_HOST", "127.0.0.1")
+MCP_PORT = int(os.getenv("MCP_PORT", "8765"))
+MCP_SOCKET_PATH = os.getenv("MCP_SOCKET_PATH", "/tmp/mcp_server.sock")
+# Largest single JSON-RPC message accepted from a client
+MCP_SOCKET_MAX_MESSAGE_BYTES = int(os.getenv("MCP_SOCKET_MAX_MESSAGE_BYTES", str(64 * 1024 * 1024)))
+
+logger = logging.getLogger("socket_transport")
+
+
+@asynccontextmanager
+async def socket_session(stream, max_message_bytes: int = MCP_SOCKET_MAX_MESSAGE_BYTES):
+    """Adapt a connected byte stream to the (read_stream, write_stream) pair Server.run expects"""
+    read_stream_writer, read_stream = anyio.create_memory_object_stream(0)
+    write_stream, write_stream_reader = anyio.create_memory_object_stream(0)
+    buffered = BufferedByteReceiveStream(stream)
+
+    async def socket_reader():
+        try:
+            async with read_stream_writer:
+                while True:
+                    try:
+                        line = await buffered.receive_until(b"\n", max_message_bytes)
+                    except (anyio.EndOfStream, anyio.IncompleteRead):
+                        return
+                    except anyio.DelimiterNotFound:
+                        logger.warning(f"Closing session: message larger than {max_message_bytes} bytes")
+                        return
+                    if not line.strip():
+                        continue
+                    try:
+                        message = types.JSONRPCMessage.model_validate_json(line)
+                    except Exception as exc:
+                        await read_stream_writer.send(exc)
+                        continue
+                    await read_stream_writer.send(SessionMessage(message))
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            await anyio.lowlevel.checkpoint()
+
+    async def socket_writer():
+        try:
+            async with write_stream_reader:
+                async for session_message in write_stream_reader:
+                    data = session_message.message.model_dump_json(by_alias=True, exclude_none=True)
+                    await stream.send(data.encode("utf-8") + b"\n")
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            await anyio.lowlevel.checkpoint()
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(socket_reader)
+        tg.start_soon(socket_writer)
+        try:
+            yield read_stream, write_stream
+        finally:
+            tg.cancel_scope.cancel()
+
+
+class SocketTransport:
+    """Accepts MCP clients on a TCP or Unix socket and runs one session per connection
+
+    Args:
+        transport: "tcp" or "unix"
+        host: TCP bind address
+        port: TCP port
+        path: Unix socket path (replaced if it already exists; created mode 0600)
+        max_message_bytes: Largest JSON-RPC message read from a client
+    """
+
+    def __init__(self, transport: str = "tcp", host: str = "127.0.0.1", port: int = 8765,
+                 path: Optional[str] = None, max_message_bytes: int = MCP_SOCKET_MAX_MESSAGE_BYTES):
+        if transport not in ("tcp", "unix"):
+            raise ValueError(f"Unknown socket transport: {transport}")
+        if transport == "unix" and not path:
+            raise ValueError("A socket path is required for the unix transport")
+        self.transport = transport
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_message_bytes = max_message_bytes
+        self._lock = threading.Lock()
+        self.active_sessions = 0
+        self.total_sessions = 0
+        self.failed_sessions = 0
+
+    @property
+    def address(self) -> str:
+        return f"unix://{self.path}" if self.transport == "unix" else f"tcp://{self.host}:{self.port}"
+
+    async def _listen(self):
+        if self.transport == "tcp":
+            return await anyio.create_tcp_listener(local_host=self.host, local_port=self.port)
+        if os.path.exists(self.path):
+            # Left behind by a previous run
+            os.unlink(self.path)
+        listener = await anyio.create_unix_listener(self.path)
+        os.chmod(self.path, 0o600)
+        return listener
+
+    async def serve(self, run_session: Callable[[Any, Any], Awaitable[None]]) -> None:
+        """Accept connections until cancelled, running run_session(read_stream, write_stream) for each"""
+        async def handle(stream):
+            with self._lock:
+                self.active_sessions += 1
+                self.total_sessions += 1
+            try:
+                async with stream:
+                    async with socket_session(stream, self.max_message_bytes) as (read_stream, write_stream):
+                        await run_session(read_stream, write_stream)
+            except Exception as e:
+                with self._lock:
+                    self.failed_sessions += 1
+                logger.warning(f"MCP session ended with an error: {e}", exc_info=True)
+            finally:
+                with self._lock:
+                    self.active_sessions -= 1
+
+        listener = await self._listen()
+        logger.info(f"Accepting MCP sessions on {self.address}")
+        try:
+            async with listener:
+                await listener.serve(handle)
+        finally:
+            if self.transport == "unix" and os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return session counters"""
+        with self._lock:
+            return {
+                "transport": self.transport,
+                "address": self.address,
+                "active_sessions": self.active_sessions,
+                "total_sessions": self.total_sessions,
+                "failed_sessions": self.failed_sessions,
+            }
@@ -0,0 +1,168 @@
+"""
+Write-behind insert buffer
+Groups classify_and_store inserts by size or time and flushes each group with
+one multi-row statement per backend instead of one commit per prompt
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500"))
+WRITE_BEHIND_FLUSH_INTERVAL_MS = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_MS", "50"))
+# "flush": callers are acknowledged once their row is committed
+# "enqueue": callers are acknowledged immediately; a crash can lose buffered rows
+WRITE_BEHIND_DURABILITY = os.getenv("WRITE_BEHIND_DURABILITY", "flush").lower()
+
+logger = logging.getLogger("write_behind")
+
+
+class WriteBehindBuffer:
+    """Buffers inserts per backend and flushes them in batches on a background thread
+
+    Args:
+        flushers: Backend name -> function that writes a list of rows and returns a result message
+        max_batch: Flush a backend as soon as this many rows are waiting
+        flush_interval_ms: Maximum time a row waits before being flushed
+        durability: "flush" (ack after commit) or "enqueue" (ack immediately)
+    """
+
+    def __init__(self, flushers: Dict[str, Callable[[List[dict]], str]], max_batch: int = 500,
+                 flush_interval_ms: float = 50, durability: str = "flush"):
+        if durability not in ("flush", "enqueue"):
+            raise ValueError(f"Unknown write-behind durability mode: {durability}")
+        self.flushers = flushers
+        self.max_batch = max(1, max_batch)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.durability = durability
+        self._pending: Dict[str, List[Tuple[dict, Future]]] = {backend: [] for backend in flushers}
+        self._oldest: Optional[float] = None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        self.enqueued = 0
+        self.flushed_rows = 0
+        self.batches = 0
+        self.failed_rows = 0
+        self.last_flush_seconds = 0.0
+
+    @property
+    def acks_after_flush(self) -> bool:
+        return self.durability == "flush"
+
+    def submit(self, backend: str, data: dict) -> Future:
+        """Queue a row; the future resolves when it is committed (or at once in enqueue mode)"""
+        if backend not in self.flushers:
+            raise ValueError(f"Unknown database: {backend}")
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-behind buffer is closed")
+            self._pending[backend].append((data, future))
+            self.enqueued += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if len(self._pending[backend]) >= self.max_batch or len(self._pending[backend]) == 1:
+                self._cond.notify()
+        if not self.acks_after_flush:
+            ack: Future = Future()
+            ack.set_result(f"Queued for {backend}")
+            return ack
+        return future
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and self._oldest is None:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                deadline = self._oldest + self.flush_interval
+                while not self._closed and not self._full():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            self.flush()
+
+    def _full(self) -> bool:
+        # Callers hold self._cond
+        return any(len(rows) >= self.max_batch for rows in self._pending.values())
+
+    def flush(self) -> None:
+        """Write everything buffered so far"""
+        with self._flush_lock:
+            with self._cond:
+                pending = self._pending
+                self._pending = {backend: [] for backend in self.flushers}
+                self._oldest = None
+            for backend, items in pending.items():
+                for start in range(0, len(items), self.max_batch):
+                    self._flush_batch(backend, items[start:start + self.max_batch])
+
+    def _flush_batch(self, backend: str, items: List[Tuple[dict, Future]]) -> None:
+        if not items:
+            return
+        started = time.monotonic()
+        try:
+            result = self.flushers[backend]([data for data, _ in items])
+        except Exception as e:
+            self.failed_rows += len(items)
+            logger.error(f"Write-behind flush of {len(items)} rows to {backend} failed: {e}")
+            for _, future in items:
+                future.set_exception(e)
+                # Mark the exception as retrieved; in enqueue mode nobody waits on it
+                future.exception()
+            return
+        self.last_flush_seconds = time.monotonic() - started
+        self.batches += 1
+        self.flushed_rows += len(items)
+        for _, future in items:
+            future.set_result(result)
+
+    def close(self) -> None:
+        """Stop the background thread and flush remaining rows (call on shutdown)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return buffering and flush counters"""
+        with self._cond:
+            pending = {backend: len(rows) for backend, rows in self._pending.items()}
+        return {
+            "enabled": True,
+            "durability": self.durability,
+            "max_batch": self.max_batch,
+            "flush_interval_ms": self.flush_interval * 1000.0,
+            "pending": pending,
+            "enqueued": self.enqueued,
+            "flushed_rows": self.flushed_rows,
+            "batches": self.batches,
+            "average_batch_size": self.flushed_rows / self.batches if self.batches else 0.0,
+            "failed_rows": self.failed_rows,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+
+def create_write_buffer_from_env(flushers: Dict[str, Callable[[List[dict]], str]]) -> Optional[WriteBehindBuffer]:
+    """Build a buffer if WRITE_BEHIND_ENABLED is set, otherwise None (write-through)"""
+    if not WRITE_BEHIND_ENABLED:
+        return None
+    return WriteBehindBuffer(
+        flushers,
+        max_batch=WRITE_BEHIND_MAX_BATCH,
+        flush_interval_ms=WRITE_BEHIND_FLUSH_INTERVAL_MS,
+        durability=WRITE_BEHIND_DURABILITY,
+    )
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Unit tests for bulk ingest parsing
+Runs without databases: classification and loading are replaced by in-memory fakes.
+
+    python -m pytest tests/test_bulk_ingest.py
+"""
+
+import asyncio
+
+import pytest
+
+from mcp_server.bulk_ingest import BulkIngestor, RowError, iter_csv_records, iter_lines, parse_csv_record
+
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def ingest(body, fmt, chunk_size=7):
+    """Run an ingest over body split into small chunks; return (events, loaded prompts)"""
+    loaded = []
+
+    async def load(prompts):
+        loaded.extend(prompts)
+
+    async def classify(prompt):
+        return "postgres"
+
+    async def run():
+        ingestor = BulkIngestor(classify=classify, loaders={"postgres": load}, batch_size=2)
+        parts = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+        return await collect(ingestor.run(iter_lines(chunks(*parts)), fmt))
+
+    return asyncio.run(run()), loaded
+
+
+def test_lines_are_split_across_chunk_boundaries():
+    lines = asyncio.run(collect(iter_lines(chunks(b"a\r\nb", "c\n", b"\n", "d"))))
+    assert lines == ["a", "bc", "", "d"]
+
+
+def test_quoted_newlines_stay_in_one_record():
+    records = asyncio.run(collect(iter_csv_records(chunks('prompt', '"mine', 'and theirs"', 'next'))))
+    assert records == [(1, "prompt"), (2, '"mine\nand theirs"'), (4, "next")]
+    assert parse_csv_record(records[1][1]) == ["mine\nand theirs"]
+
+
+@pytest.mark.parametrize("line", [
+    '"a ""quoted"" word",x',
+    '5" screen,x',
+    'a, "b,x',
+])
+def test_quotes_that_do_not_open_a_field_end_the_record(line):
+    records = asyncio.run(collect(iter_csv_records(chunks(line, "next"))))
+    assert [record for _, record in records] == [line, "next"]
+
+
+def test_unterminated_quote_is_rejected():
+    records = asyncio.run(collect(iter_csv_records(chunks('"mine', 'and theirs'))))
+    assert records == [(1, '"mine\nand theirs')]
+    with pytest.raises(RowError):
+        parse_csv_record(records[0][1])
+
+
+def test_csv_ingest_keeps_multiline_fields():
+    events, loaded = ingest('prompt\n"mine\nand theirs"\nsecond\n"third, with comma"\n', "csv")
+    assert sorted(loaded) == ["mine\nand theirs", "second", "third, with comma"]
+    assert events[-1] == {"type": "summary", "rows": 3, "errors": 0, "postgres": 3}
+
+
+def test_csv_ingest_reports_unterminated_quote_with_its_line():
+    events, loaded = ingest('prompt\nfirst\n"never closed\nswallowed\n', "csv")
+    assert loaded == ["first"]
+    errors = [event for event in events if event["type"] == "error"]
+    assert len(errors) == 1 and errors[0]["line"] == 3
+
+
+def test_ndjson_ingest_reports_bad_rows_with_their_line():
+    events, loaded = ingest('{"prompt": "a"}\n"b"\nnot json\n{"other": 1}\n\n{"name": "c"}\n', "ndjson")
+    assert sorted(loaded) == ["a", "b", "c"]
+    assert [event["line"] for event in events if event["type"] == "error"] == [3, 4]
+    assert events[-1]["rows"] == 3 and events[-1]["errors"] == 2
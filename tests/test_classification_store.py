@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the persistent classification store
+Runs against a temporary SQLite file.
+
+    python -m pytest tests/test_classification_store.py
+"""
+
+import sqlite3
+
+from mcp_server.classification_store import ClassificationStore
+
+
+def test_lookups_do_not_wait_for_a_flush(tmp_path):
+    store = ClassificationStore(str(tmp_path / "store.sqlite3"), flush_interval=0)
+    store._pending["stored"] = ("neo4j", 1.0)
+    store.flush()
+    store._pending["in flight"] = ("postgres", 2.0)
+    # Hold the writer's lock as a long flush or compaction would
+    with store._lock:
+        batch, store._pending = store._pending, {}
+        store._flushing = batch
+        assert store.get("stored") == ("neo4j", 1.0)
+        assert store.get("in flight") == ("postgres", 2.0)
+
+
+def test_failed_flush_requeues_without_overwriting_newer_entries(tmp_path):
+    store = ClassificationStore(str(tmp_path / "store.sqlite3"), flush_interval=0)
+    store._pending["a"] = ("neo4j", 1.0)
+    store.flush()
+    store._connection().execute(
+        "CREATE TRIGGER fail BEFORE INSERT ON classifications BEGIN SELECT RAISE(ABORT, 'full'); END"
+    )
+    store._pending["b"] = ("postgres", 2.0)
+    assert store.flush() == 0
+    assert store.stats()["errors"] == 1
+    assert store.get("b") == ("postgres", 2.0)
+    store._connection().execute("DROP TRIGGER fail")
+    assert store.flush() == 1
+    with sqlite3.connect(store.path) as conn:
+        assert dict(conn.execute("SELECT key, label FROM classifications")) == {"a": "neo4j", "b": "postgres"}
@@ -36,6 +36,12 @@ class MCPToolTester:
             
             # Test 4: query_neo4j tool
             await self.test_query_neo4j()
+            
+            # Test 5: explain_query tool
+            await self.test_explain_query()
+            
+            # Test 6: query guard rejects writes and stacked statements
+            await self.test_query_guard()
         
         print("=" * 50)
         print("🎉 Tool tests completed!")
@@ -50,11 +56,15 @@ class MCPToolTester:
             await self.test_query_postgres()
         elif tool_name == "query_neo4j":
             await self.test_query_neo4j()
+        elif tool_name == "explain_query":
+            await self.test_explain_query()
+        elif tool_name == "query_guard":
+            await self.test_query_guard()
         elif tool_name == "list" or tool_name == "tools_list":
             await self.test_list_tools()
         else:
             print(f"\n⚠️ Unknown tool: {tool_name}")
-            print("Available tools: classify_and_store, query_postgres, query_neo4j, list")
+            print("Available tools: classify_and_store, query_postgres, query_neo4j, explain_query, query_guard, list")
     
     async def test_list_tools(self):
         """Test the tools/list endpoint by directly examining the handle_list_tools function"""
@@ -210,11 +220,47 @@ asyncio.run(main())
             print("  ✅ query_neo4j tool executed successfully")
         else:
             print("  ❌ query_neo4j tool execution failed")
+    
+    async def test_explain_query(self):
+        """Test the explain_query tool"""
+        print("\n🧭 Testing explain_query tool...")
+        
+        # Explain one query on each database
+        for database, query in (("postgres", "SELECT * FROM users WHERE name = 'John Doe'"),
+                                ("neo4j", "MATCH (p:Person) WHERE p.name = 'John Doe' RETURN p")):
+            result = await self.direct_tool_test(
+                "explain_query",
+                {"database": database, "query": query}
+            )
+            
+            if result and result.get("success") and "Query Plan" in result.get("output", ""):
+                print(f"  ✅ explain_query tool executed successfully on {database}")
+            else:
+                print(f"  ❌ explain_query tool execution failed on {database}")
+
+    async def test_query_guard(self):
+        """Test that query_postgres and explain_query refuse writes and stacked statements"""
+        print("\n🛡️ Testing query guard...")
+        
+        # A plain write fails in the read-only transaction; a stacked one is rejected before it runs
+        for tool, query in (("query_postgres", "DELETE FROM users WHERE name = 'John Doe'"),
+                            ("query_postgres", "SELECT 1; COMMIT; DELETE FROM users WHERE name = 'John Doe'"),
+                            ("explain_query", "SELECT 1; COMMIT; DELETE FROM users WHERE name = 'John Doe'")):
+            arguments = {"query": query}
+            if tool == "explain_query":
+                arguments["database"] = "postgres"
+            result = await self.direct_tool_test(tool, arguments)
+            
+            output = result.get("output", "") if result else ""
+            if "Error" in output and ("read-only" in output or "Query rejected" in output):
+                print(f"  ✅ {tool} refused: {query}")
+            else:
+                print(f"  ❌ {tool} did not refuse: {query}")
 
 async def main():
     """Main function"""
     parser = argparse.ArgumentParser(description="Test MCP server tools")
-    parser.add_argument("--tool", help="Specific tool to test (classify_and_store, query_postgres, query_neo4j, list)")
+    parser.add_argument("--tool", help="Specific tool to test (classify_and_store, query_postgres, query_neo4j, explain_query, query_guard, list)")
     args = parser.parse_args()
     
     tester = MCPToolTester()
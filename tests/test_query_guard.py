@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the query guard's statement checks
+Runs without databases: a fake cursor records what would be sent to Postgres.
+
+    python -m pytest tests/test_query_guard.py
+"""
+
+import pytest
+
+from mcp_server.query_guard import QueryGuard, QueryRejected, split_postgres_statements
+
+
+class RecordingCursor:
+    """Records executed SQL and answers EXPLAIN with a cheap plan"""
+
+    def __init__(self, plan_rows=1):
+        self.executed = []
+        self.plan_rows = plan_rows
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+
+    def fetchone(self):
+        return ([{"Plan": {"Total Cost": 1.0, "Plan Rows": self.plan_rows}}],)
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT 1; COMMIT; DELETE FROM users",
+    "SELECT 1;DELETE FROM users",
+    "SELECT 'a''b'; DELETE FROM users",
+    "SELECT E'a\\'b'; DELETE FROM users",
+    "SELECT $$;$$; DELETE FROM users",
+    "SELECT 1 /* ; */; DELETE FROM users -- ;",
+    "DELETE FROM users; SELECT 1",
+])
+def test_stacked_statements_are_rejected_before_anything_runs(query):
+    guard = QueryGuard()
+    cur = RecordingCursor()
+    with pytest.raises(QueryRejected):
+        guard.prepare_postgres(cur, query)
+    assert cur.executed == []
+
+
+def test_stacked_statements_are_rejected_with_admission_disabled():
+    guard = QueryGuard(enabled=False)
+    cur = RecordingCursor()
+    with pytest.raises(QueryRejected):
+        guard.prepare_postgres(cur, "SELECT 1; COMMIT; DELETE FROM users")
+    assert cur.executed == []
+
+
+def test_writes_run_read_only():
+    guard = QueryGuard()
+    cur = RecordingCursor()
+    query = guard.prepare_postgres(cur, "DELETE FROM users")
+    assert cur.executed[0] == "SET TRANSACTION READ ONLY"
+    assert query == "DELETE FROM users"
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("SELECT 1;", "SELECT 1"),
+    ("SELECT ';' AS semi -- trailing; comment\n;", "SELECT ';' AS semi -- trailing; comment"),
+    ('SELECT 1 AS ";"', 'SELECT 1 AS ";"'),
+    ("SELECT $tag$ ; $x$ ; $tag$", "SELECT $tag$ ; $x$ ; $tag$"),
+    ("SELECT $1::int", "SELECT $1::int"),
+    ("SELECT 'it''s; fine'", "SELECT 'it''s; fine'"),
+])
+def test_single_statements_are_admitted(query, expected):
+    guard = QueryGuard()
+    cur = RecordingCursor()
+    assert guard.prepare_postgres(cur, query) == expected
+    assert cur.executed[-1] == "EXPLAIN (FORMAT JSON) " + expected
+
+
+@pytest.mark.parametrize("query", ["", ";", "  -- only a comment", "SELECT 'unterminated", "SELECT /* open"])
+def test_empty_and_unterminated_queries_are_rejected(query):
+    with pytest.raises(QueryRejected):
+        QueryGuard().prepare_postgres(RecordingCursor(), query)
+
+
+def test_split_keeps_separate_statements():
+    assert split_postgres_statements("SELECT 1; SELECT ';'") == ["SELECT 1", " SELECT ';'"]
+
+
+@pytest.mark.parametrize("query", [
+    "-- list\nSELECT * FROM a, b, c",
+    "/* outer /* nested */ */ SELECT * FROM a",
+    "  \n-- one\n/* two */\n  with t AS (SELECT 1) SELECT * FROM t",
+])
+def test_leading_comments_do_not_skip_explain(query):
+    guard = QueryGuard()
+    cur = RecordingCursor()
+    guard.prepare_postgres(cur, query)
+    assert cur.executed[-1] == "EXPLAIN (FORMAT JSON) " + query.strip()
+
+
+def test_row_limit_survives_a_trailing_line_comment():
+    guard = QueryGuard(max_rows=10)
+    cur = RecordingCursor(plan_rows=1000)
+    query = guard.prepare_postgres(cur, "SELECT * FROM users -- everyone")
+    assert query == "SELECT * FROM (\nSELECT * FROM users -- everyone\n) AS guarded_query LIMIT 10"
+    assert guard.stats()["limited"] == 1
@@ -1,74 +1,138 @@
 #!/usr/bin/env python3
 """
 MCP Server Wrapper for Windsurf
-This script connects to the running MCP server Docker container and forwards stdin/stdout
+This script connects to the long-running MCP server's socket (see MCP_SERVER_ADDRESS)
+and bridges stdin/stdout to it. If the server is not listening, it falls back to
+starting a server process with docker exec, forwarding stdin, stdout and stderr
+and exiting with its status. Both paths copy raw bytes in large chunks in both
+directions at once, so multi-megabyte messages stream through without
+per-line overhead or deadlock.
 """
 
 import subprocess
+import socket
 import sys
 import os
 import signal
+import threading
+
+# tcp://host:port or unix:///path/to/socket
+MCP_SERVER_ADDRESS = os.getenv("MCP_SERVER_ADDRESS", "tcp://127.0.0.1:8765")
+MCP_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "2"))
+CHUNK_SIZE = 64 * 1024
+
+def connect(address):
+    """Connect to the MCP server socket, or return None if it is not listening"""
+    try:
+        if address.startswith("unix://"):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(MCP_CONNECT_TIMEOUT)
+            sock.connect(address[len("unix://"):])
+        else:
+            host, _, port = address[len("tcp://"):].rpartition(":")
+            sock = socket.create_connection((host, int(port)), timeout=MCP_CONNECT_TIMEOUT)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(None)
+        return sock
+    except (OSError, ValueError) as e:
+        print(f"MCP server not reachable at {address}: {e}", file=sys.stderr)
+        return None
+
+def write_all(fd):
+    """A write function that retries partial writes until every byte reached fd"""
+    def write(data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    return write
+
+def pump(read, write, done=None):
+    """Copy chunks from read(n) to write(data) until end of stream, then call done()"""
+    try:
+        while True:
+            data = read(CHUNK_SIZE)
+            if not data:
+                break
+            write(data)
+    except OSError:
+        # Broken pipe or reset connection: the other side is gone
+        pass
+    finally:
+        if done is not None:
+            try:
+                done()
+            except OSError:
+                pass
+
+def start_pump(read, write, done=None):
+    thread = threading.Thread(target=pump, args=(read, write, done), daemon=True)
+    thread.start()
+    return thread
+
+def read_stdin(n):
+    return os.read(sys.stdin.fileno(), n)
+
+def bridge(sock):
+    """Copy bytes between stdio and the socket until the server closes the connection"""
+    # End of input half-closes the socket; the server's responses keep flowing back
+    start_pump(read_stdin, sock.sendall, lambda: sock.shutdown(socket.SHUT_WR))
+    try:
+        pump(sock.recv, write_all(sys.stdout.fileno()))
+    finally:
+        sock.close()
+    return 0
+
+def run_docker_exec():
+    """Start a server process in the container for this session only and return its exit status"""
+    # Binary, unbuffered pipes: bytes are passed through as they arrive, not line by line
+    process = subprocess.Popen(
+        [
+            "docker", "exec", "-i", "mcp_server",
+            "python", "-m", "mcp_server.mcp_server"
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        bufsize=0
+    )
+
+    # Handle signals
+    def handle_signal(sig, frame):
+        process.terminate()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    # All three streams are pumped concurrently so neither side can block on a full pipe
+    start_pump(read_stdin, write_all(process.stdin.fileno()), process.stdin.close)
+    outputs = [
+        start_pump(process.stdout.read, write_all(sys.stdout.fileno())),
+        start_pump(process.stderr.read, write_all(sys.stderr.fileno())),
+    ]
+    returncode = process.wait()
+    for thread in outputs:
+        thread.join()
+    return returncode
 
 def main():
     """Main function to run the MCP server wrapper"""
     print("Starting MCP server wrapper for Windsurf...", file=sys.stderr)
-    
+
     try:
-        # Connect to the running Docker container
-        process = subprocess.Popen(
-            [
-                "docker", "exec", "-i", "mcp_server", 
-                "python", "-m", "mcp_server.mcp_server"
-            ],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=0  # Unbuffered
-        )
-        
-        # Forward stdin to the process
-        def forward_stdin():
-            while True:
-                try:
-                    line = sys.stdin.readline()
-                    if not line:
-                        break
-                    process.stdin.write(line)
-                    process.stdin.flush()
-                except (BrokenPipeError, IOError):
-                    break
-        
-        # Forward stdout from the process
-        def forward_stdout():
-            while True:
-                try:
-                    line = process.stdout.readline()
-                    if not line:
-                        break
-                    sys.stdout.write(line)
-                    sys.stdout.flush()
-                except (BrokenPipeError, IOError):
-                    break
-        
-        # Handle signals
-        def handle_signal(sig, frame):
-            process.terminate()
-            sys.exit(0)
-        
-        signal.signal(signal.SIGINT, handle_signal)
-        signal.signal(signal.SIGTERM, handle_signal)
-        
-        # Start forwarding in the main thread
-        try:
-            forward_stdin()
-        finally:
-            process.terminate()
-            process.wait()
-    
+        sock = connect(MCP_SERVER_ADDRESS)
+        if sock is not None:
+            signal.signal(signal.SIGTERM, lambda sig, frame: sys.exit(0))
+            status = bridge(sock)
+        else:
+            print("Falling back to docker exec", file=sys.stderr)
+            status = run_docker_exec()
+
     except Exception as e:
         print(f"Error in MCP server wrapper: {e}", file=sys.stderr)
         sys.exit(1)
 
+    # Exit with the server's status (negative when it was killed by a signal)
+    sys.exit(status if status >= 0 else 128 - status)
+
 if __name__ == "__main__":
     main()